@@ -1,201 +1,430 @@
-import spacy
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
-
 import json
+import logging
+import os
 
-# import utils.transcript as transcript
+import utils.transcript as transcription
 import utils.name_cleaning as name_cleaning
 import utils.nfl as nfl
-# import sentiment_analysis.bart_large_mnli as bart
-import sentiment_analysis.nli_deberta_v3_base as nli
+from utils.roster_index import RosterIndex, TEAM_MENTION_BOOST
+from utils.chunking import split_into_chunks
+from utils.timed_transcript import TimedTranscript
+import utils.context_window as context_window
+import utils.coreference as coreference
+from utils.resolution_cache import ResolutionCache, request_resolution_cache
+from utils.pair_score_cache import default_pair_score_cache
+from sentiment_analysis.engines import get_engine
+from registry import registry
+from result_cache import result_cache, make_key
+from metrics import metrics, stage
+
+logger = logging.getLogger(__name__)
 
-nlp = spacy.load("en_core_web_md")
-sentencizer = nlp.add_pipe("sentencizer")
+# transcripts are streamed through nlp.pipe in paragraph-sized chunks
+SPACY_CHUNK_CHARS = int(os.environ.get("SPACY_CHUNK_CHARS", 10000))
+SPACY_N_PROCESS = int(os.environ.get("SPACY_N_PROCESS", 1))
+SPACY_BATCH_SIZE = int(os.environ.get("SPACY_BATCH_SIZE", 8))
+# matches sure enough to remember for surname mentions and to attribute following pronouns to
+ANTECEDENT_STATUSES = ("perfect match", "recent mention")
     
-def process_transcript(podcast_transcript_filepath=None, podcast_transcript_text=None )-> tuple[list[dict], list[str]]:
+def process_transcript(podcast_transcript_filepath=None, podcast_transcript_text=None, progress=None, timed_transcript: TimedTranscript = None)-> tuple[list[dict], list, list[str]]:
     # read transcript file to variable raw_transcript
     raw_transcript = ""
-    if (podcast_transcript_filepath):
-        print("reading transcript from file")
-        raw_transcript = open(podcast_transcript_filepath, "r", encoding="utf-8").read()
+    if timed_transcript is not None:
+        logger.debug("reading transcript from timed transcript")
+        raw_transcript = timed_transcript.text
+    elif (podcast_transcript_filepath):
+        logger.debug("reading transcript from file")
+        with stage("read"):
+            raw_transcript = open(podcast_transcript_filepath, "r", encoding="utf-8").read()
     elif podcast_transcript_text:
-        print("reading transcript from text input")
+        logger.debug("reading transcript from text input")
         raw_transcript = podcast_transcript_text
     else: 
         return ValueError("Either podcast_transcript_filepath or podcast_transcript_text must be provided.")
     
-    # use spacy to split raw_transcript into sentences and identify named entities
-    doc = nlp(raw_transcript)
-    raw_sentences = list(doc.sents)
+    identified_names, raw_sentences, clean_sentences, _ = segment_transcript(raw_transcript, progress=progress)
+    if timed_transcript is not None:
+        attach_audio_times(identified_names, timed_transcript)
+    return identified_names, raw_sentences, clean_sentences
+
+def segment_transcript(raw_transcript: str, progress=None) -> tuple[list[dict], list, list[str], list[int]]:
+    # use spacy to split raw_transcript into sentences and identify named entities,
+    # chunk by chunk so sentence indexes run on across chunks
+    nlp = registry.get_nlp()
+    chunks = split_into_chunks(raw_transcript, max_chars=SPACY_CHUNK_CHARS)
+    raw_sentences = []
+    # character offset of each sentence in raw_transcript
+    sentence_offsets = []
+    with stage("spacy_parse"):
+        docs = nlp.pipe([chunk_text for _, chunk_text in chunks], n_process=SPACY_N_PROCESS, batch_size=SPACY_BATCH_SIZE)
+        for (chunk_offset, _), doc in zip(chunks, docs):
+            for sent in doc.sents:
+                raw_sentences.append(sent)
+                sentence_offsets.append(chunk_offset + sent.start_char)
+            if progress is not None:
+                progress({"stage": "segmenting", "sentences_processed": len(raw_sentences)})
+    metrics.count("sentences", len(raw_sentences))
 
     # # create list of stringified sentences and write to sentences.json    
     # stringified_sentences = [sent.text.strip() for sent in raw_sentences]
     # with open("../resources/sentences.json", "w", encoding="utf-8") as f:
     #     json.dump(stringified_sentences, f, ensure_ascii=False, indent=2)
     
+    # every sentence is stripped and nickname-cleaned once, for both identified_names and the context windows
+    with stage("nickname_cleaning"):
+        clean_sentences = context_window.clean_sentences(raw_sentences)
+    
     # create list of identified names, associated with the sentence index and the sentence itself
     identified_names = []
-    for i, sent in enumerate(raw_sentences, start=0):
-        names = [ent.text for ent in sent.ents if ent.label_ == "PERSON"]
-        for name in names:
-            # Remove leading articles from the name (e.g., "a Jackson Dart" -> "Jackson Dart")
-            cleaned_name = name.strip()
-            for article in ["a ", "an ", "the "]:
-                if cleaned_name.lower().startswith(article):
-                    cleaned_name = cleaned_name[len(article):]
-            if name_cleaning.name_is_valid(cleaned_name):
-                clean_name = name_cleaning.replace_nickname_in_name(cleaned_name)
-                clean_sentence = name_cleaning.replace_nickname_in_sentence(sent.text.strip())
-                identified_names.append({
-                    "name": clean_name,
-                    "sentence_index": i,
-                    "sentence": clean_sentence
-                })
+    with stage("entity_extraction"):
+        for i, sent in enumerate(raw_sentences, start=0):
+            names = [ent for ent in sent.ents if ent.label_ == "PERSON"]
+            for ent in names:
+                name = ent.text
+                # Remove leading articles from the name (e.g., "a Jackson Dart" -> "Jackson Dart")
+                cleaned_name = name.strip()
+                for article in ["a ", "an ", "the "]:
+                    if cleaned_name.lower().startswith(article):
+                        cleaned_name = cleaned_name[len(article):]
+                if name_cleaning.name_is_valid(cleaned_name):
+                    clean_name = name_cleaning.replace_nickname_in_name(cleaned_name)
+                    # character span of the mention in raw_transcript
+                    char_offset = sentence_offsets[i] + ent.start_char - sent.start_char
+                    identified_names.append({
+                        "name": clean_name,
+                        "sentence_index": i,
+                        "sentence": clean_sentences[i],
+                        "char_offset": char_offset,
+                        "char_end": char_offset + len(name)
+                    })
+    metrics.count("mentions", len(identified_names))
     # for identified_name in identified_names:
     #     print(f"{identified_name['name']} | {identified_name['sentence_index']} | {identified_name['sentence']}")
-    return identified_names, raw_sentences
+    return identified_names, raw_sentences, clean_sentences, sentence_offsets
+
+def attach_audio_times(identified_names: list[dict], timed_transcript: TimedTranscript):
+    # audio start/end (seconds) of the transcribed segments each mention falls in
+    for player_object in identified_names:
+        audio_start, audio_end = timed_transcript.time_span(player_object['char_offset'], player_object['char_end'])
+        player_object['audio_start'] = audio_start
+        player_object['audio_end'] = audio_end
+
+def mention_times(final_player_object: dict, player: str) -> list[dict]:
+    return [
+        {"sentence_index": occurrence['sentence_index'], "audio_start": occurrence['audio_start'], "audio_end": occurrence['audio_end']}
+        for occurrence in final_player_object[player]['occurrence_array'] if 'audio_start' in occurrence
+    ]
     
     
-def match_players_to_roster(identified_names: list[dict]) -> dict:
-    # save list of real NFL players to nfl_player_roster
-    # nfl.get_nfl_players()
-    nfl_player_roster = {}
-    with open("../resources/nfl_roster.json", "r") as f:
-        nfl_player_roster = json.load(f)
-        
-    # nfl_player_names = [player['name'] for player in nfl_player_roster]
-    nfl_player_names = nfl_player_roster.keys()
+def resolve_player_name(player: str, roster_index: RosterIndex, mentioned_teams: frozenset[str] = frozenset()) -> tuple[list[tuple[str, int]], str]:
+    # with a team mentioned nearby, every candidate is scored so a teammate past the top 5 ties isn't cut off
+    closest_player_list = roster_index.extract(player, limit=None if mentioned_teams else 5)
+            
+    def boosted_score(close_player: tuple[str, int]) -> int:
+        # a candidate whose team is mentioned around the mention gets TEAM_MENTION_BOOST points
+        return close_player[1] + (TEAM_MENTION_BOOST if roster_index.team_of(close_player[0]) in mentioned_teams else 0)
+
+    possible_matches = [close_player for close_player in closest_player_list if close_player[1] == 100]
+    if len(possible_matches) < 1: 
+        possible_matches = [close_player for close_player in closest_player_list if boosted_score(close_player) > 80]
+    if len(possible_matches) > 1 and mentioned_teams:
+        # a mentioned team only settles a tie at the top score ("Allen" near "Bills"), the tied players on other teams drop out
+        top_score = max(close_player[1] for close_player in possible_matches)
+        on_mentioned_team = [
+            close_player for close_player in possible_matches
+            if close_player[1] == top_score and roster_index.team_of(close_player[0]) in mentioned_teams
+        ]
+        if len(on_mentioned_team) > 0:
+            possible_matches = [close_player for close_player in possible_matches if close_player[1] < top_score or close_player in on_mentioned_team]
+    # the best boosted score first; sorted() is stable, so equal scores keep extract's order
+    possible_matches = sorted(possible_matches, key=boosted_score, reverse=True)[:5]
+    
+    if (len(possible_matches) == 0):
+        return possible_matches, "no match"
+    # perfect match or multiple matches
+    return possible_matches, "perfect match" if len(possible_matches) == 1 else "best of multiple matches"
+    
+def attribute_pronouns(final_player_object: dict, nfl_player_roster: dict, clean_sentences: list[str], pronoun_context: coreference.PronounContext, until_index: int):
+    # sentences right after a mention that name nobody but say "he"/"him"/"his" are about the player that mention
+    # named, if it named exactly one player and matched them with confidence
+    if pronoun_context.sentence_index is None:
+        return
+    first_index = max(pronoun_context.sentence_index + 1, pronoun_context.attributed_until)
+    last_index = min(until_index, pronoun_context.sentence_index + coreference.PRONOUN_MAX_DISTANCE + 1)
+    pronoun_context.attributed_until = max(pronoun_context.attributed_until, last_index)
+    if len(pronoun_context.players) != 1:
+        return
+    player, status = next(iter(pronoun_context.players.items()))
+    if status not in ANTECEDENT_STATUSES:
+        return
+    roster_entry = nfl_player_roster[player]
+    for sentence_index in range(first_index, last_index):
+        pronoun = coreference.mentions_pronoun(clean_sentences[sentence_index])
+        if pronoun is None:
+            continue
+        # in a session the player may have been matched in an earlier append
+        player_entry = final_player_object.setdefault(player, {'occurrence_array': [], 'mentioned_sentence_indexes': set()})
+        player_entry['occurrence_array'].append({
+            "transcript_name": pronoun,
+            "player_id": roster_entry['id'],
+            "player_team": roster_entry['team'],
+            "matched_name": player,
+            "score": 0,
+            "status": "pronoun",
+            "sentence_index": sentence_index,
+            "sentence": clean_sentences[sentence_index],
+            "original sentence": clean_sentences[sentence_index]
+        })
+        player_entry['mentioned_sentence_indexes'].add(sentence_index)
+        metrics.count("pronoun_mentions")
+
+@stage("roster_match")
+def match_players_to_roster(identified_names: list[dict], nfl_player_roster: dict = None, roster_index: RosterIndex = None, resolution_cache: ResolutionCache = None, windows: context_window.ContextWindows = None, entity_table: coreference.EntityTable = None, pronoun_context: coreference.PronounContext = None) -> dict:
+    # windows, if given, is where team mentions are looked for (otherwise each mention's own sentence), and enables
+    # pronoun attribution. entity_table holds the recently matched players surname/first-name mentions resolve to first,
+    # pronoun_context the latest mention pronouns refer back to; sessions pass their own to carry both across appends
+    if nfl_player_roster is None or roster_index is None:
+        nfl_player_roster, roster_index = registry.get_roster()
+    if resolution_cache is None:
+        resolution_cache = ResolutionCache()
+    resolution_cache.bind_roster(roster_index.version)
+    if entity_table is None:
+        entity_table = coreference.EntityTable()
+    if pronoun_context is None:
+        pronoun_context = coreference.PronounContext()
+    attribute = windows is not None and coreference.COREFERENCE_PRONOUNS
 
     # fuzzy match identified names to nfl_player_roster, and save in final_player_object
     final_player_object = {}
+    teams_by_context = {}
     for player_object in identified_names:
         player = player_object['name']
-        closest_player_list = process.extract(player, nfl_player_names, limit=5, scorer=fuzz.token_set_ratio)
-                
-        possible_matches = [close_player for close_player in closest_player_list if close_player[1] == 100]
-        if len(possible_matches) < 1: 
-            possible_matches = [close_player for close_player in closest_player_list if close_player[1] > 80]
+        if player_object['sentence_index'] != pronoun_context.sentence_index:
+            if attribute:
+                attribute_pronouns(final_player_object, nfl_player_roster, windows.clean_sentences, pronoun_context, player_object['sentence_index'])
+            pronoun_context.start_sentence(player_object['sentence_index'])
+
+        recent_player = entity_table.lookup(player)
+        if recent_player is not None:
+            # "Kittle" a few sentences after "George Kittle"
+            resolution = ([(recent_player, 100)], "recent mention")
+            metrics.count("recent_mention_matches")
+        else:
+            context = windows.get(player_object['sentence_index']) if windows is not None else player_object['sentence']
+            # mentions in the same sentence share a window. the mention itself is left out of it, so the city in a
+            # name ("Dallas Goedert") doesn't count as a mention of that city's team
+            mentioned_teams = teams_by_context.get((context, player))
+            if mentioned_teams is None:
+                mentioned_teams = teams_by_context[(context, player)] = roster_index.mentioned_teams(context.replace(player, " "))
+            resolution = resolution_cache.get(player, mentioned_teams)
+            if resolution is None:
+                resolution = resolve_player_name(player, roster_index, mentioned_teams)
+                resolution_cache.put(player, resolution, mentioned_teams)
+        possible_matches, status = resolution
+        if status == "best of multiple matches":
+            metrics.count("ambiguous_matches")
+        elif status in ANTECEDENT_STATUSES:
+            entity_table.remember(possible_matches[0][0])
        
         final_name = ""
-        status = ""
         if (len(possible_matches) == 0):
             # no matches
             final_name = player
-            status = "no match"
+            pronoun_context.players[final_name] = status
         else:
-            # perfect match or multiple matches
             final_name = possible_matches[0][0]
+            pronoun_context.players[final_name] = status
             # replace name in sentence with final_name
             original_sentence = player_object['sentence']
             player_object['sentence'] = player_object['sentence'].replace(player, final_name)
             
-            status = "perfect match" if len(possible_matches) == 1 else "best of multiple matches"
+            roster_entry = nfl_player_roster[final_name]
+            occurrence = {
+                "transcript_name": player,
+                "player_id": roster_entry['id'],
+                "player_team": roster_entry['team'],
+                "matched_name": final_name,
+                "score": possible_matches[0][1] if len(possible_matches) > 0 else 0,
+                "status": status,
+                "sentence_index": player_object['sentence_index'],
+                "sentence": player_object['sentence'],
+                "original sentence": original_sentence
+            }
+            # mentions from a timed transcript keep their audio position
+            if 'audio_start' in player_object:
+                occurrence['audio_start'] = player_object['audio_start']
+                occurrence['audio_end'] = player_object['audio_end']
             
             if final_name in final_player_object:
-                final_player_object[final_name]['occurrence_array'].append({
-                    "transcript_name": player,
-                    "player_id": nfl_player_roster[final_name]['id'],
-                    "matched_name": final_name,
-                    "score": possible_matches[0][1] if len(possible_matches) > 0 else 0,
-                    "status": status,
-                    "sentence_index": player_object['sentence_index'],
-                    "sentence": player_object['sentence'],
-                    "original sentence": original_sentence
-                })
+                final_player_object[final_name]['occurrence_array'].append(occurrence)
                 final_player_object[final_name]['mentioned_sentence_indexes'].add(player_object['sentence_index'])
             else:
                 final_player_object[final_name] = {
-                    'occurrence_array': [{
-                        "transcript_name": player,
-                        "player_id": nfl_player_roster[final_name]['id'],
-                        "matched_name": final_name,
-                        "score": possible_matches[0][1] if len(possible_matches) > 0 else 0,
-                        "status": status,
-                        "sentence_index": player_object['sentence_index'],
-                        "sentence": player_object['sentence'],
-                        "original sentence": original_sentence
-                    }],
+                    'occurrence_array': [occurrence],
                     'mentioned_sentence_indexes': set([player_object['sentence_index']])
                 }
+    if attribute:
+        attribute_pronouns(final_player_object, nfl_player_roster, windows.clean_sentences, pronoun_context, len(windows))
     
     # sorted_final_player_object = sorted(final_player_object, key=lambda x: x['matched_name'].lower()) 
     # sorted_final_player_object = dict(sorted(final_player_object.items()))
     # print(sorted_final_player_object)    
+    metrics.count("players", len(final_player_object))
     return final_player_object
 
 def example_analysis() -> dict:
     transcipt_file_path = "../resources/transcript.txt"
-    identified_names, raw_sentences = process_transcript(podcast_transcript_filepath=transcipt_file_path)
-    print("Total Identified Names:", len(identified_names))
+    identified_names, raw_sentences, clean_sentences = process_transcript(podcast_transcript_filepath=transcipt_file_path)
+    logger.info("Total Identified Names: %d", len(identified_names))
     
-    final_player_object = match_players_to_roster(identified_names)
-    print("Total Unique Players Mentioned:", len(final_player_object))
-    print(final_player_object)
+    windows = context_window.ContextWindows(clean_sentences)
+    final_player_object = match_players_to_roster(identified_names, windows=windows)
+    logger.info("Total Unique Players Mentioned: %d", len(final_player_object))
+    logger.debug("final_player_object: %s", final_player_object)
     
-    player_sentiments = nli.analyze_sentiment(final_player_object, raw_sentences)
-    print("Total Players with Sentiment Analysis:", len(player_sentiments))
+    player_sentiments = get_engine().analyze_sentiment(final_player_object, windows)
+    logger.info("Total Players with Sentiment Analysis: %d", len(player_sentiments))
         
     return player_sentiments
 
-def set_up_to_analyze(transcript: str) -> dict:
-    identified_names, raw_sentences = process_transcript(podcast_transcript_text=transcript)
-    print("Total Identified Names:", len(identified_names))
+def transcript_arguments(transcript) -> dict:
+    # analyze, set_up_to_analyze and stream_analysis take plain text or a TimedTranscript
+    if isinstance(transcript, TimedTranscript):
+        return {"timed_transcript": transcript}
+    return {"podcast_transcript_text": transcript}
+
+def set_up_to_analyze(transcript: str | TimedTranscript) -> dict:
+    cache_key = make_key("setup", transcript)
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.info("returning cached setup result")
+        return cached_result
     
-    final_player_object = match_players_to_roster(identified_names)
-    print("Total Unique Players Mentioned:", len(final_player_object))
-    print(final_player_object)
+    identified_names, raw_sentences, clean_sentences = process_transcript(**transcript_arguments(transcript))
+    logger.info("Total Identified Names: %d", len(identified_names))
+    
+    resolution_cache = request_resolution_cache()
+    final_player_object = match_players_to_roster(identified_names, resolution_cache=resolution_cache, windows=context_window.ContextWindows(clean_sentences))
+    logger.debug("Resolution cache: %s", resolution_cache.stats())
+    logger.info("Total Unique Players Mentioned: %d", len(final_player_object))
+    logger.debug("final_player_object: %s", final_player_object)
     
     # Convert sets to lists for JSON serialization
     for player in final_player_object.values():
         if isinstance(player.get('mentioned_sentence_indexes'), set):
             player['mentioned_sentence_indexes'] = list(player['mentioned_sentence_indexes'])
     
-    return {
+    setup_result = {
         "final_player_object": final_player_object,
         "stripped_sentences": [sent.text.strip() for sent in raw_sentences]
     }
+    result_cache.put(cache_key, setup_result)
+    return setup_result
 
-def analyze(transcript: str) -> dict:
-    identified_names, raw_sentences = process_transcript(podcast_transcript_text=transcript)
-    print("Total Identified Names:", len(identified_names))
+def analyze(transcript: str | TimedTranscript, progress=None, engine: str = None) -> dict:
+    # progress, if given, is called with dicts of updated counters ("stage", "sentences_processed", "players_scored", ...).
+    # engine picks the sentiment engine by name (see sentiment_analysis.engines), defaulting to SENTIMENT_ENGINE
+    sentiment_engine = get_engine(engine)
+    cache_key = make_key("analyze", transcript, sentiment_engine.name)
+    metrics.count("requests")
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.info("returning cached analysis result")
+        metrics.count("cached_requests")
+        if progress is not None:
+            progress({"stage": "cached", "players_total": len(cached_result), "players_scored": len(cached_result)})
+        return cached_result
     
-    final_player_object = match_players_to_roster(identified_names)
-    print("Total Unique Players Mentioned:", len(final_player_object))
-    print(final_player_object)
+    identified_names, raw_sentences, clean_sentences = process_transcript(progress=progress, **transcript_arguments(transcript))
+    logger.info("Total Identified Names: %d", len(identified_names))
     
-    player_sentiments = nli.analyze_sentiment(final_player_object, raw_sentences)
-    print("Total Players with Sentiment Analysis:", len(player_sentiments))
-        
+    if progress is not None:
+        progress({"stage": "matching", "names_identified": len(identified_names)})
+    resolution_cache = request_resolution_cache()
+    windows = context_window.ContextWindows(clean_sentences)
+    final_player_object = match_players_to_roster(identified_names, resolution_cache=resolution_cache, windows=windows)
+    logger.debug("Resolution cache: %s", resolution_cache.stats())
+    logger.info("Total Unique Players Mentioned: %d", len(final_player_object))
+    logger.debug("final_player_object: %s", final_player_object)
+    
+    if progress is not None:
+        progress({"stage": "scoring", "players_total": len(final_player_object), "players_scored": 0})
+    player_sentiments = sentiment_engine.analyze_sentiment(final_player_object, windows, progress=progress)
+    logger.info("Total Players with Sentiment Analysis: %d", len(player_sentiments))
+    logger.debug("NLI pair cache: %s", default_pair_score_cache().stats())
+    if isinstance(transcript, TimedTranscript):
+        for player, sentiment in player_sentiments.items():
+            sentiment['mention_times'] = mention_times(final_player_object, player)
+    
+    result_cache.put(cache_key, player_sentiments)
     return player_sentiments
 
+def stream_analysis(transcript: str | TimedTranscript, engine: str = None):
+    # same pipeline as analyze, as a generator of (event, data) pairs: progress events per stage, then one
+    # "player" event per player as soon as it is scored, most-mentioned players first
+    sentiment_engine = get_engine(engine)
+    cache_key = make_key("analyze", transcript, sentiment_engine.name)
+    metrics.count("requests")
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        metrics.count("cached_requests")
+        yield "progress", {"stage": "cached", "players_total": len(cached_result)}
+        for player in sorted(cached_result, key=lambda player: len(cached_result[player]['detailed_sentiment']), reverse=True):
+            yield "player", {"player": player, "sentiment": cached_result[player]}
+        yield "done", {"players_scored": len(cached_result), "cached": True}
+        return
+    
+    yield "progress", {"stage": "segmenting"}
+    identified_names, raw_sentences, clean_sentences = process_transcript(**transcript_arguments(transcript))
+    yield "progress", {"stage": "matching", "sentences_processed": len(raw_sentences), "names_identified": len(identified_names)}
+    
+    windows = context_window.ContextWindows(clean_sentences)
+    final_player_object = match_players_to_roster(identified_names, resolution_cache=request_resolution_cache(), windows=windows)
+    players_by_mentions = sorted(
+        final_player_object, key=lambda player: len(final_player_object[player]['mentioned_sentence_indexes']), reverse=True
+    )
+    yield "progress", {"stage": "scoring", "players_total": len(final_player_object), "players_scored": 0}
+    
+    player_sentiments = {}
+    for player, sentiment in sentiment_engine.iter_player_sentiments(final_player_object, windows, players=players_by_mentions):
+        if isinstance(transcript, TimedTranscript):
+            sentiment['mention_times'] = mention_times(final_player_object, player)
+        player_sentiments[player] = sentiment
+        yield "player", {"player": player, "sentiment": sentiment}
+    
+    result_cache.put(cache_key, player_sentiments)
+    yield "done", {"players_scored": len(player_sentiments), "cached": False}
+
+def analyze_audio(audio_filepath: str, workers: int = transcription.TRANSCRIPTION_WORKERS, engine: str = None) -> dict:
+    # transcribe in parallel chunks and hand the timed transcript straight to analyze, no transcript file round trip
+    return analyze(transcription.transcribe_audio(audio_filepath, workers=workers), engine=engine)
 
 def main():
     # # Transcript section
     # podcastAudioFileName = "rookie_te_breakout_incoming!_top_12_tes_for_fantasy_football_2025.wav"
     # print("getting transcript with faster-whisper...")
-    # # transcription_results = transcript.getTranscriptFromAudio(f"../resources/{podcastAudioFileName}")
+    # # transcription_results = transcription.getTranscriptFromAudio(f"../resources/{podcastAudioFileName}")
     # # clean_transcription_results = transcription_results["text"].strip('"').strip()
-    # transcription_results = transcript.getFasterTranscriptFromAudio(f"../resources/{podcastAudioFileName}")
+    # transcription_results = transcription.getFasterTranscriptFromAudio(f"../resources/{podcastAudioFileName}")
     # print(transcription_results)
     
     # TODO: sentiment analysis section
         # what happens if reviews are 1 positive and 1 negative?
         # should be waited based on extremeness of average (100% positive, 50% negative => positive)
 
-        # if only first_name found, and first_name is among previously identified fullel_names, replace first_name with full_name in sentence
     transcipt_file_path = "../resources/transcript.txt"
-    identified_names, raw_sentences = process_transcript(transcipt_file_path)
-    print("Total Identified Names:", len(identified_names))
+    identified_names, raw_sentences, clean_sentences = process_transcript(transcipt_file_path)
+    logger.info("Total Identified Names: %d", len(identified_names))
     with open("../outputs/identified_names/nli_identified_names.json", "w", encoding="utf-8") as f:
         json.dump(identified_names, f, ensure_ascii=False, indent=2)
     
-    final_player_object = match_players_to_roster(identified_names)
-    print("Total Unique Players Mentioned:", len(final_player_object))
-    print(final_player_object)
+    windows = context_window.ContextWindows(clean_sentences)
+    final_player_object = match_players_to_roster(identified_names, windows=windows)
+    logger.info("Total Unique Players Mentioned: %d", len(final_player_object))
+    logger.debug("final_player_object: %s", final_player_object)
     
-    player_sentiments = nli.analyze_sentiment(final_player_object, raw_sentences)
-    print("Total Players with Sentiment Analysis:", len(player_sentiments))
+    player_sentiments = get_engine().analyze_sentiment(final_player_object, windows)
+    logger.info("Total Players with Sentiment Analysis: %d", len(player_sentiments))
     
     with open("../outputs/only_matches/nli/player_sentiments.json", "w", encoding="utf-8") as f:
         json.dump(player_sentiments, f, ensure_ascii=False, indent=2)
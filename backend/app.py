@@ -1,48 +1,232 @@
-from flask import Flask, jsonify, request
+import json
+import logging
+import os
+
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import requests
 import analyzer as sentiment_analyzer
+import utils.roster_store as roster_store
+from utils.resolution_cache import shared_resolution_cache
+from utils.pair_score_cache import shared_pair_score_cache
+from registry import registry
+from jobs import JobQueue, QueueFullError
+from result_cache import result_cache
+from sessions import SessionStore
+from utils.timed_transcript import TimedTranscript, TranscriptFormatError
+from sentiment_analysis.engines import engines
+from registry import SENTIMENT_ENGINE, REGISTRY_PRELOAD, NLI_SERVER_ADDRESS, NLI_BATCHING
+from sentiment_analysis.batching import lane
+from metrics import metrics, profiled
+
+# DEBUG also logs request bodies and the matched player objects, which is slow for long transcripts
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, origins=[
     "http://localhost:3000",
 ])
 
+# load spaCy, the roster and the NLI model once per worker and warm them up; /ready reports when that's done.
+# under gunicorn's preload_app, spaCy and the roster load here in the master and the rest after each fork (gunicorn.conf.py)
+if REGISTRY_PRELOAD:
+    registry.load_shared()
+else:
+    registry.load_all_in_background(warm_up=True)
+
+def analyze_in_backfill(transcript, **options):
+    # nobody is waiting on an async job's connection, so its NLI pairs give way to interactive requests
+    with lane("backfill"):
+        return sentiment_analyzer.analyze(transcript, **options)
+
+job_queue = JobQueue(analyze_in_backfill)
+session_store = SessionStore()
+
+def transcript_from_request(data: dict):
+    # plain text under "transcript", or a transcript with segment timings under "timed_transcript"
+    # (TimedTranscript.to_dict, or {"segments": [{"start", "end", "text"}, ...]}); a malformed one is a 400
+    timed_transcript = data.get('timed_transcript', None)
+    if timed_transcript:
+        return TimedTranscript.from_dict(timed_transcript)
+    return data.get('transcript', None)
+
+@app.errorhandler(TranscriptFormatError)
+def invalid_transcript(e):
+    return jsonify({"error": "Invalid timed_transcript", "detail": str(e)}), 400
+
+def wants_profile(data: dict) -> bool:
+    # opt-in per-request profile: ?profile=1 or "profile": true in the body
+    return request.args.get('profile', '0') not in ("0", "false") or bool(data.get('profile', False))
+
+def run_profiled(data: dict, run):
+    # the plain result, or {"result": ..., "profile": ...} with stage timings, counters and memory for this request
+    if not wants_profile(data):
+        return run()
+    with profiled() as profile:
+        result = run()
+    return {"result": result, "profile": profile.to_dict()}
+
+def engine_error(engine):
+    # requests may pick a sentiment engine by name; None means the server default
+    if engine is not None and not isinstance(engine, str):
+        return jsonify({"error": "engine must be a string", "engines": sorted(engines)}), 400
+    if engine is not None and engine not in engines:
+        return jsonify({"error": f"Unknown engine {engine!r}", "engines": sorted(engines)}), 400
+    return None
+
 @app.route("/")
 def hello_world():
     return "<p>Hello, World!</p>"
 
+@app.route("/ready", methods=['GET'])
+def ready():
+    status = registry.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route("/engines", methods=['GET'])
+def get_engines():
+    return jsonify({
+        "default": SENTIMENT_ENGINE,
+        "engines": {
+            name: {"loaded": engine.resource in registry.resources, **({"stats": engine.stats()} if hasattr(engine, "stats") else {})}
+            for name, engine in engines.items()
+        },
+    })
+
 @app.route("/analyze", methods=['POST'])
 def analyze():
-    print("analyze endpoint hit")
-    print("transcript is: ")
+    logger.debug("analyze endpoint hit")
     data = request.get_json()
-    print(data)
+    logger.debug("request body: %s", data)
     
-    
-    transcript = data.get('transcript', None)
+    transcript = transcript_from_request(data)
     
     if (not transcript):
         return jsonify({"error": "No transcript provided"}), 469
     
-    print("transcript received, analyzing...")
-    response = sentiment_analyzer.analyze(transcript)
+    engine = data.get('engine', None)
+    error = engine_error(engine)
+    if error:
+        return error
+    
+    logger.debug("transcript received, analyzing...")
+    response = run_profiled(data, lambda: sentiment_analyzer.analyze(transcript, engine=engine))
+    
+    return jsonify(response)
+
+@app.route("/analyze/stream", methods=['POST'])
+def analyzeStream():
+    data = request.get_json()
+    
+    transcript = transcript_from_request(data)
+    
+    if (not transcript):
+        return jsonify({"error": "No transcript provided"}), 400
+    
+    engine = data.get('engine', None)
+    error = engine_error(engine)
+    if error:
+        return error
+    
+    def events():
+        try:
+            for event, payload in sentiment_analyzer.stream_analysis(transcript, engine=engine):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    
+    # server-sent events; X-Accel-Buffering stops proxies from holding the stream back
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@app.route("/jobs", methods=['POST'])
+def submit_job():
+    data = request.get_json()
+    
+    transcript = transcript_from_request(data)
+    
+    if (not transcript):
+        return jsonify({"error": "No transcript provided"}), 400
+    
+    engine = data.get('engine', None)
+    error = engine_error(engine)
+    if error:
+        return error
+    
+    try:
+        job = job_queue.submit(transcript, engine=engine)
+    except QueueFullError as e:
+        return jsonify({"error": "Analysis queue is full, try again later", "detail": str(e)}), 429
+    
+    return jsonify({"id": job.id, "status": job.status}), 202
+
+@app.route("/jobs", methods=['GET'])
+def get_job_queue_stats():
+    return jsonify(job_queue.stats())
+
+@app.route("/jobs/<job_id>", methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    
+    if (not job):
+        return jsonify({"error": "Job not found"}), 404
+    
+    return jsonify(job.to_dict())
+
+@app.route("/sessions", methods=['POST'])
+def create_session():
+    session = session_store.create()
+    return jsonify({"id": session.id}), 201
+
+@app.route("/sessions/<session_id>/append", methods=['POST'])
+def append_to_session(session_id):
+    session = session_store.get(session_id)
+    
+    if (not session):
+        return jsonify({"error": "Session not found"}), 404
+    
+    data = request.get_json()
+    text = data.get('text', None)
+    
+    if (not text):
+        return jsonify({"error": "No text provided"}), 400
+    
+    # final=true closes the last sentence instead of waiting for the next chunk to finish it
+    response = session.append(text, final=bool(data.get('final', False)))
     
     return jsonify(response)
 
+@app.route("/sessions/<session_id>", methods=['GET'])
+def get_session(session_id):
+    session = session_store.get(session_id)
+    
+    if (not session):
+        return jsonify({"error": "Session not found"}), 404
+    
+    return jsonify(session.snapshot())
+
+@app.route("/sessions/<session_id>", methods=['DELETE'])
+def delete_session(session_id):
+    if (not session_store.delete(session_id)):
+        return jsonify({"error": "Session not found"}), 404
+    
+    return jsonify({"id": session_id, "deleted": True})
+
 @app.route("/analyze/setup", methods=['POST'])
 def analyzeSetup():
-    print("analyze/setup endpoint hit")
-    print("transcript is: ")
+    logger.debug("analyze/setup endpoint hit")
     data = request.get_json()
     
-    transcript = data.get('transcript', None)
+    transcript = transcript_from_request(data)
     
     if (not transcript):
         return jsonify({"error": "No transcript provided"}), 400
     
-    print("transcript received, analyzing...")
-    response = sentiment_analyzer.set_up_to_analyze(transcript)
+    logger.debug("transcript received, analyzing...")
+    response = run_profiled(data, lambda: sentiment_analyzer.set_up_to_analyze(transcript))
     
     return jsonify(response)
 
@@ -53,46 +237,55 @@ def analyzeExample():
 
 @app.route('/nfl/athletes', methods=['GET'])
 def get_nfl_athletes():
-    print("in get_nfl_athletes")
-    url = "https://partners.api.espn.com/v2/sports/football/nfl/athletes?limit=20000"
+    logger.debug("in get_nfl_athletes")
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        print("data received")
-        
-        print(data)
-        athletes_array = data['athletes']
-        
-        output_array = {}
-        for athlete in athletes_array:
-            athlete_object = {
-                'id': athlete['id'],
-                'team': athlete['team']['displayName']
-            }
-            print(athlete_object)
-            
-            output_array[athlete['displayName']] = athlete_object
-        print("output_array constructed")
-        # output_array = []
-        # for athlete in athletes_array:
-        #     athlete_object = {
-        #         'id': athlete['id'],
-        #         'name': athlete['displayName'],
-        #         'team': athlete['team']['displayName']
-        #     }
-        #     print(athlete_object)
-            
-        #     output_array.append(athlete_object)
-        print("writing to nfl_roster.json")
-        with open('../resources/nfl_roster.json', 'w') as f:
-            import json
-            json.dump(output_array, f, ensure_ascii=False, indent=2)
-        
-        print("returning output_array")
-        return jsonify(output_array)
-    except requests.RequestException as e:
+        # ESPN, or the recorded payload at ROSTER_PAYLOAD_PATH
+        payload = roster_store.fetch_athletes_payload()
+        logger.debug("data received")
+        # ?force=1 applies a refresh that would remove a large part of the roster
+        store, delta = roster_store.refresh_roster_store(payload, force=request.args.get('force', '0') not in ("0", "false"))
+    except roster_store.RosterShrinkError as e:
+        return jsonify({'error': str(e)}), 409
+    except (requests.RequestException, ValueError) as e:
         return jsonify({'error': str(e)}), 500
+    logger.info("roster %s revision %s: %s", store.version, store.revision, roster_store.delta_summary(delta))
+
+    if not roster_store.delta_is_empty(delta):
+        # reload the in-memory roster index; cached name -> roster resolutions point at the old roster
+        registry.reload("roster")
+        shared_resolution_cache.clear()
+
+    return jsonify(store.to_dict())
+
+@app.route('/nfl/roster', methods=['GET'])
+def get_nfl_roster_stamp():
+    store, _ = registry.get_roster()
+    return jsonify(store.stamp())
+
+@app.route("/metrics", methods=['GET'])
+def get_metrics():
+    # Prometheus text exposition format
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/cache/resolution", methods=['GET'])
+def get_resolution_cache_stats():
+    return jsonify(shared_resolution_cache.stats())
+    
+@app.route("/cache/nli", methods=['GET'])
+def get_nli_pair_cache_stats():
+    return jsonify(shared_pair_score_cache.stats())
+
+@app.route("/nli/batching", methods=['GET'])
+def get_nli_batching_stats():
+    # batch scheduler stats (fill rate, queue wait per lane) of the NLI server this worker sends its pairs to, or of
+    # this worker's own scheduler
+    if not NLI_SERVER_ADDRESS and not NLI_BATCHING:
+        return jsonify({'error': "neither NLI_SERVER_ADDRESS nor NLI_BATCHING is set, pairs go straight to the model"}), 404
+    return jsonify(registry.get_nli_model().stats())
+
+@app.route("/cache/results", methods=['GET'])
+def get_result_cache_stats():
+    return jsonify(result_cache.stats())
     
 @app.route("/nfl/athlete/photo/<player_id>", methods=['GET'])
 def get_player_photo(player_id):
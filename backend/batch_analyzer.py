@@ -0,0 +1,156 @@
+# Batch analysis of a directory of transcripts (e.g. a season backfill) across a process pool.
+# run from backend/: python batch_analyzer.py ../resources/episodes --workers 4
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DEFAULT_OUTPUT_DIR = "../outputs/batch"
+PLAYER_INDEX_FILENAME = "player_index.json"
+REPORT_FILENAME = "throughput_report.json"
+
+def init_worker(threads_per_worker: int, engine: str = None):
+    # each worker loads spaCy, the roster and the sentiment model once, then reuses them for every episode it gets
+    if engine:
+        # registry preloads the default engine's model, so make the batch's engine the default
+        os.environ["SENTIMENT_ENGINE"] = engine
+    # the ONNX backend reads its thread count when registry is imported
+    os.environ.setdefault("NLI_ONNX_THREADS", str(threads_per_worker))
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    from registry import registry
+    registry.load_all(warm_up=True)
+
+def episode_name(transcript_path: str) -> str:
+    return os.path.splitext(os.path.basename(transcript_path))[0]
+
+def episode_output_path(output_dir: str, transcript_path: str) -> str:
+    return os.path.join(output_dir, "episodes", f"{episode_name(transcript_path)}.json")
+
+def analyze_episode(transcript_path: str, output_path: str, engine: str = None) -> dict:
+    import analyzer
+    from sentiment_analysis.batching import lane
+
+    start = time.perf_counter()
+    counters = {}
+    with open(transcript_path, "r", encoding="utf-8") as f:
+        transcript = f.read()
+    # backfill lane: with a shared NLI server, interactive requests go ahead of batch runs
+    with lane("backfill"):
+        player_sentiments = analyzer.analyze(transcript, progress=counters.update, engine=engine)
+
+    # write to a temp file first, so an interrupted run never leaves a half-written result that looks complete
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(player_sentiments, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, output_path)
+
+    return {
+        "episode": episode_name(transcript_path),
+        "worker": os.getpid(),
+        "sentences": counters.get("sentences_processed", 0),
+        "players": len(player_sentiments),
+        "seconds": time.perf_counter() - start,
+    }
+
+def build_player_index(output_dir: str) -> dict:
+    # player -> every episode they were scored in, merged from the per-episode results
+    player_index = {}
+    for result_path in sorted(glob.glob(os.path.join(output_dir, "episodes", "*.json"))):
+        episode = os.path.splitext(os.path.basename(result_path))[0]
+        with open(result_path, "r", encoding="utf-8") as f:
+            player_sentiments = json.load(f)
+        for player, sentiment in player_sentiments.items():
+            entry = player_index.setdefault(player, {
+                "player_id": sentiment.get("player_id"),
+                "player_team": sentiment.get("player_team"),
+                "episodes": [],
+            })
+            entry["episodes"].append({
+                "episode": episode,
+                "mentions": len(sentiment["detailed_sentiment"]),
+                "sentiment_consensus": sentiment["sentiment_consensus"],
+                "average_label": sentiment["average_label"],
+                "most_frequent_label": sentiment["most_frequent_label"],
+            })
+    return player_index
+
+def throughput_report(episode_stats: list[dict], elapsed: float, workers: int, skipped: int) -> dict:
+    per_worker = {}
+    for stats in episode_stats:
+        worker = per_worker.setdefault(str(stats["worker"]), {"episodes": 0, "sentences": 0, "seconds": 0.0})
+        worker["episodes"] += 1
+        worker["sentences"] += stats["sentences"]
+        worker["seconds"] += stats["seconds"]
+    for worker in per_worker.values():
+        worker["sentences_per_second"] = worker["sentences"] / worker["seconds"] if worker["seconds"] > 0 else 0.0
+
+    return {
+        "workers": workers,
+        "episodes_analyzed": len(episode_stats),
+        "episodes_skipped": skipped,
+        "elapsed_seconds": elapsed,
+        "episodes_per_minute": len(episode_stats) / (elapsed / 60) if elapsed > 0 else 0.0,
+        "per_worker": per_worker,
+        "episodes": episode_stats,
+    }
+
+def run_batch(input_dir: str, output_dir: str = DEFAULT_OUTPUT_DIR, workers: int = None, pattern: str = "*.txt", force: bool = False, engine: str = None) -> dict:
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(os.path.join(output_dir, "episodes"), exist_ok=True)
+
+    transcript_paths = sorted(glob.glob(os.path.join(input_dir, pattern)))
+    # resumable: episodes with a finished result file are skipped unless --force
+    pending = [path for path in transcript_paths if force or not os.path.exists(episode_output_path(output_dir, path))]
+    skipped = len(transcript_paths) - len(pending)
+    print(f"{len(transcript_paths)} transcripts found, {skipped} already analyzed, {len(pending)} to go on {workers} workers")
+
+    episode_stats = []
+    start = time.perf_counter()
+    if len(pending) > 0:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(threads_per_worker, engine)) as executor:
+            futures = {executor.submit(analyze_episode, path, episode_output_path(output_dir, path), engine): path for path in pending}
+            for future in as_completed(futures):
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    print(f"failed {futures[future]}: {e}")
+                    continue
+                episode_stats.append(stats)
+                print(f"[{len(episode_stats)}/{len(pending)}] {stats['episode']}: {stats['players']} players, "
+                      f"{stats['sentences']} sentences in {stats['seconds']:.1f}s (worker {stats['worker']})")
+    elapsed = time.perf_counter() - start
+
+    with open(os.path.join(output_dir, PLAYER_INDEX_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(build_player_index(output_dir), f, ensure_ascii=False, indent=2)
+
+    report = throughput_report(episode_stats, elapsed, workers, skipped)
+    with open(os.path.join(output_dir, REPORT_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze every transcript in a directory across a process pool.")
+    parser.add_argument("input_dir")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--pattern", default="*.txt")
+    parser.add_argument("--force", action="store_true", help="re-analyze episodes that already have a result")
+    parser.add_argument("--engine", default=None, help="sentiment engine (default: SENTIMENT_ENGINE)")
+    args = parser.parse_args()
+
+    report = run_batch(args.input_dir, args.output_dir, args.workers, args.pattern, args.force, args.engine)
+    print(f"{report['episodes_analyzed']} episodes in {report['elapsed_seconds']:.1f}s "
+          f"({report['episodes_per_minute']:.2f} episodes/min)")
+    for worker, stats in report["per_worker"].items():
+        print(f"  worker {worker}: {stats['episodes']} episodes, {stats['sentences_per_second']:.1f} sentences/sec")
+
+if __name__ == "__main__":
+    main()
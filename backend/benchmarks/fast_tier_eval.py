@@ -0,0 +1,75 @@
+# Escalation rate, agreement with the full DeBERTa model and cost of the two-tier scorer, per escalation threshold,
+# on the bundled evaluation set (resources/sentiment_eval.json).
+# run from backend/: python -m benchmarks.fast_tier_eval [--thresholds 0.5 0.6 0.7 0.8 0.9] [--output report.json]
+import argparse
+import json
+import time
+
+import numpy as np
+
+import sentiment_analysis.fast_tier as fast_tier
+import sentiment_analysis.nli_deberta_v3_base as nli
+from registry import registry
+from train_fast_tier import load_eval_set, EVAL_SET_PATH
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9, 0.95])
+    parser.add_argument("--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    windows = load_eval_set(args.eval_set)
+    nlp = registry.get_nlp()
+    model = registry.get_fast_tier()
+    print(f"{len(windows)} evaluation windows, fast tier {model.version}")
+
+    # warm-up so neither tier pays first-call costs
+    nli.score_windows(windows[:1])
+    model.predict_proba(fast_tier.window_features(windows[:1], nlp))
+
+    start = time.perf_counter()
+    full_labels = np.argmax(nli.score_windows(windows), axis=1)
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    probabilities = model.predict_proba(fast_tier.window_features(windows, nlp))
+    fast_seconds = time.perf_counter() - start
+    fast_labels = np.argmax(probabilities, axis=1)
+    confidence = np.max(probabilities, axis=1)
+
+    report = {
+        "windows": len(windows),
+        "fast_tier_version": model.version,
+        "full_seconds": full_seconds,
+        "fast_seconds": fast_seconds,
+        "fast_only_agreement": float(np.mean(fast_labels == full_labels)),
+        "configured_threshold": fast_tier.FAST_TIER_THRESHOLD,
+        "thresholds": [],
+    }
+    print(f"full model {full_seconds:.2f}s, fast tier {fast_seconds:.3f}s, fast tier alone agrees on {report['fast_only_agreement']:.1%}")
+
+    for threshold in sorted(set(args.thresholds + [fast_tier.FAST_TIER_THRESHOLD])):
+        escalate = confidence < threshold
+        tiered_labels = np.where(escalate, full_labels, fast_labels)
+        escalation_rate = float(np.mean(escalate))
+        # the full model's cost scales with the windows it scores
+        estimated_seconds = fast_seconds + escalation_rate * full_seconds
+        result = {
+            "threshold": threshold,
+            "escalation_rate": escalation_rate,
+            "agreement": float(np.mean(tiered_labels == full_labels)),
+            "estimated_seconds": estimated_seconds,
+            "speedup": full_seconds / estimated_seconds if estimated_seconds > 0 else 0.0,
+        }
+        report["thresholds"].append(result)
+        marker = " (configured)" if threshold == fast_tier.FAST_TIER_THRESHOLD else ""
+        print(f"threshold {threshold:.2f}{marker}: escalated {escalation_rate:6.1%}, agreement {result['agreement']:6.1%}, "
+              f"speedup {result['speedup']:.2f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
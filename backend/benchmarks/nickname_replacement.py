@@ -0,0 +1,64 @@
+# Compares nickname substitution: the old rebuild-and-recompile regex per call vs the prebuilt trie matcher,
+# with the built-in mappings and with a large synthetic ASR-misspelling dictionary.
+# run from backend/: python -m benchmarks.nickname_replacement [--extra-nicknames 20000]
+import argparse
+import json
+import random
+import re
+import string
+import time
+
+import utils.name_cleaning as name_cleaning
+
+def legacy_replace(sentence: str, mappings: dict) -> str:
+    def replacer(match):
+        return mappings.get(match.group(0).lower())
+    
+    pattern = r"\b(" + "|".join(map(re.escape, mappings.keys())) + r")\b"
+    return re.sub(pattern, replacer, sentence, flags=re.IGNORECASE)
+
+def synthetic_mappings(count: int, seed: int = 11) -> dict:
+    rng = random.Random(seed)
+    mappings = {}
+    while len(mappings) < count:
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))) for _ in range(rng.randint(1, 2))]
+        mappings[" ".join(words)] = "Synthetic Player"
+    return mappings
+
+def time_calls(replace, sentences: list[str]) -> tuple[float, list[str]]:
+    start = time.perf_counter()
+    output = [replace(sentence) for sentence in sentences]
+    return time.perf_counter() - start, output
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--extra-nicknames", type=int, default=20000)
+    parser.add_argument("--legacy-sentences", type=int, default=200)
+    args = parser.parse_args()
+    
+    with open("../resources/sentences.json", "r", encoding="utf-8") as f:
+        sentences = json.load(f)
+    
+    for label, mappings in [
+        ("built-in", dict(name_cleaning.nickname_mappings)),
+        (f"built-in + {args.extra_nicknames} synthetic", {**synthetic_mappings(args.extra_nicknames), **name_cleaning.nickname_mappings}),
+    ]:
+        start = time.perf_counter()
+        matcher = name_cleaning.NicknameMatcher(mappings)
+        build_elapsed = time.perf_counter() - start
+        
+        # the legacy path recompiles per call; only time a sample so large dictionaries finish
+        sample = sentences[:args.legacy_sentences]
+        legacy_elapsed, legacy_output = time_calls(lambda s: legacy_replace(s, mappings), sample)
+        _, trie_sample_output = time_calls(matcher.replace, sample)
+        trie_elapsed, _ = time_calls(matcher.replace, sentences)
+        
+        print(f"{label} ({len(mappings)} nicknames)")
+        print(f"  trie build:   {build_elapsed * 1000:8.1f} ms")
+        print(f"  legacy regex: {len(sample) / legacy_elapsed:10.1f} sentences/sec")
+        print(f"  trie:         {len(sentences) / trie_elapsed:10.1f} sentences/sec "
+              f"(speedup {(legacy_elapsed / len(sample)) / (trie_elapsed / len(sentences)):.1f}x)")
+        print(f"  identical output on sample: {legacy_output == trie_sample_output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Accuracy parity and latency of the ONNX Runtime NLI backends against the PyTorch CrossEncoder,
+# on every player window of resources/transcript.txt.
+# run from backend/: python -m benchmarks.nli_backends [--backends torch onnx onnx-int8] [--batch-size 32] [--output report.json]
+import argparse
+import json
+import time
+
+import numpy as np
+
+import analyzer
+import registry
+import sentiment_analysis.nli_deberta_v3_base as nli
+import utils.context_window as context_window
+
+REFERENCE_BACKEND = "torch"
+
+def load_windows(filepath: str) -> tuple[dict, list[tuple[str, str]]]:
+    identified_names, _, clean_sentences = analyzer.process_transcript(podcast_transcript_filepath=filepath)
+    windows = context_window.ContextWindows(clean_sentences)
+    final_player_object = analyzer.match_players_to_roster(identified_names, windows=windows)
+    player_windows = nli.gather_player_windows(final_player_object, windows)
+    return final_player_object, [(player, text) for player, player_text in player_windows.items() for text in player_text]
+
+def time_backend(model, windows: list[tuple[str, str]], batch_size: int, repeats: int) -> tuple[np.ndarray, list[float]]:
+    # one warm-up pass so neither backend pays first-call allocation costs
+    nli.score_windows(windows[:1], batch_size=batch_size, model=model)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        scores = nli.score_windows(windows, batch_size=batch_size, model=model)
+        timings.append(time.perf_counter() - start)
+    return scores, timings
+
+def player_labels(final_player_object: dict, windows: list[tuple[str, str]], scores: np.ndarray) -> dict:
+    # same aggregation as analyze: average_label per player from that player's window rows
+    rows_by_player = {}
+    for (player, _), window_scores in zip(windows, scores):
+        rows_by_player.setdefault(player, []).append(window_scores)
+    return {player: nli.candidate_labels[int(np.argmax(np.mean(rows, axis=0)))] for player, rows in rows_by_player.items()}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transcript", default="../resources/transcript.txt")
+    parser.add_argument("--backends", nargs="+", default=registry.NLI_BACKENDS, choices=registry.NLI_BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=nli.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    final_player_object, windows = load_windows(args.transcript)
+    print(f"{len(windows)} windows across {len(final_player_object)} players, {registry.NLI_ONNX_THREADS} ONNX threads")
+
+    backends = [REFERENCE_BACKEND] + [backend for backend in args.backends if backend != REFERENCE_BACKEND]
+    report = {"windows": len(windows), "players": len(final_player_object), "batch_size": args.batch_size, "backends": {}}
+    reference_scores = None
+    reference_labels = None
+    for backend in backends:
+        start = time.perf_counter()
+        model = registry.load_nli_model(backend)
+        load_seconds = time.perf_counter() - start
+
+        scores, timings = time_backend(model, windows, args.batch_size, args.repeats)
+        best_seconds = min(timings)
+        labels = player_labels(final_player_object, windows, scores)
+        result = {
+            "load_seconds": load_seconds,
+            "best_seconds": best_seconds,
+            "windows_per_second": len(windows) / best_seconds if best_seconds > 0 else 0.0,
+            "ms_per_window": 1000 * best_seconds / len(windows) if len(windows) > 0 else 0.0,
+        }
+        if reference_scores is None:
+            reference_scores, reference_labels = scores, labels
+        else:
+            result.update({
+                "speedup": report["backends"][REFERENCE_BACKEND]["best_seconds"] / best_seconds if best_seconds > 0 else 0.0,
+                "max_score_diff": float(np.max(np.abs(scores - reference_scores))) if len(windows) > 0 else 0.0,
+                "mean_score_diff": float(np.mean(np.abs(scores - reference_scores))) if len(windows) > 0 else 0.0,
+                "window_label_agreement": float(np.mean(np.argmax(scores, axis=1) == np.argmax(reference_scores, axis=1))) if len(windows) > 0 else 1.0,
+                "player_label_agreement": float(np.mean([labels[player] == reference_labels[player] for player in labels])) if len(labels) > 0 else 1.0,
+            })
+        report["backends"][backend] = result
+
+        line = f"{backend:>10}: {result['windows_per_second']:8.2f} windows/sec ({result['ms_per_window']:.1f} ms/window, load {load_seconds:.1f}s)"
+        if backend != REFERENCE_BACKEND:
+            line += (f", speedup {result['speedup']:.2f}x, max score diff {result['max_score_diff']:.2e}, "
+                     f"window labels {result['window_label_agreement']:.1%}, player labels {result['player_label_agreement']:.1%}")
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
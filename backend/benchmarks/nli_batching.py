@@ -0,0 +1,91 @@
+# Compares windows/sec of the batched NLI stage against the old one-predict-per-window loop.
+# run from backend/: python -m benchmarks.nli_batching [--windows 200] [--batch-sizes 8 32 64]
+# with NLI_BATCHING=0, so the batch sizes reach the model instead of the cross-request scheduler
+import argparse
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import sentiment_analysis.nli_deberta_v3_base as nli
+import utils.context_window as context_window
+from utils.pair_score_cache import shared_pair_score_cache
+
+PLAYERS = ["Brock Bowers", "George Kittle", "Trey McBride", "Sam LaPorta", "Travis Kelce", "T.J. Hockenson"]
+
+def load_sentences(filepath: str = "../resources/sentences.json") -> list:
+    with open(filepath, "r", encoding="utf-8") as f:
+        # get_context_window reads sent.text, so wrap the stored strings like spaCy spans
+        return [SimpleNamespace(text=sentence) for sentence in json.load(f)]
+
+def build_player_object(raw_sentences: list, max_windows: int) -> dict:
+    final_player_object = {}
+    total_windows = 0
+    for i, sent in enumerate(raw_sentences):
+        for player in PLAYERS:
+            if player.split()[-1].lower() in sent.text.lower() and total_windows < max_windows:
+                entry = final_player_object.setdefault(player, {
+                    'occurrence_array': [{
+                        "status": "perfect match",
+                        "transcript_name": player,
+                        "player_id": "",
+                        "player_team": "",
+                    }],
+                    'mentioned_sentence_indexes': set()
+                })
+                entry['mentioned_sentence_indexes'].add(i)
+                total_windows += 1
+    return final_player_object
+
+def legacy_analyze(player_windows: dict) -> dict:
+    # the pre-batching loop: one model.predict call (3 pairs) per context window
+    model = nli.registry.get_nli_model()
+    scores_by_player = {}
+    for player, player_text in player_windows.items():
+        rows = []
+        for text in player_text:
+            pairs = [(text, nli.make_hypotheses(player, label)) for label in nli.candidate_labels]
+            scores = model.predict(pairs, show_progress_bar=False)
+            entailment_col_index = model.config.label2id['entailment']
+            rows.append(scores[:, entailment_col_index])
+        scores_by_player[player] = np.array(rows)
+    return scores_by_player
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--windows", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64, 128])
+    args = parser.parse_args()
+    
+    raw_sentences = load_sentences()
+    final_player_object = build_player_object(raw_sentences, args.windows)
+    windows = context_window.ContextWindows(context_window.clean_sentences(raw_sentences))
+    player_windows = nli.gather_player_windows(final_player_object, windows)
+    window_count = sum(len(player_text) for player_text in player_windows.values())
+    print(f"{window_count} windows across {len(player_windows)} players")
+    
+    # warm-up so neither path pays first-call allocation costs
+    nli.score_windows([(PLAYERS[0], raw_sentences[0].text)])
+    
+    start = time.perf_counter()
+    legacy_scores = legacy_analyze(player_windows)
+    legacy_elapsed = time.perf_counter() - start
+    print(f"legacy loop:        {window_count / legacy_elapsed:8.2f} windows/sec ({legacy_elapsed:.2f}s)")
+    
+    for batch_size in args.batch_sizes:
+        # a cold pair cache per run, or every run after the first is only cache lookups
+        shared_pair_score_cache.clear()
+        start = time.perf_counter()
+        sentiment_object = nli.analyze_sentiment(final_player_object, windows, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        
+        max_diff = 0.0
+        for player, result in sentiment_object.items():
+            batched = np.array([list(window["scores"].values()) for window in result["detailed_sentiment"]])
+            max_diff = max(max_diff, float(np.max(np.abs(batched - legacy_scores[player]))))
+        print(f"batched (bs={batch_size:>4}): {window_count / elapsed:8.2f} windows/sec ({elapsed:.2f}s, "
+              f"speedup {legacy_elapsed / elapsed:.2f}x, max score diff {max_diff:.2e})")
+
+if __name__ == "__main__":
+    main()
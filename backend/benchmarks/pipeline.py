@@ -0,0 +1,180 @@
+# Stage-by-stage timings of the analysis pipeline on the bundled transcript, roster and sentences, at 1x and on
+# synthetic transcripts scaled to 10x/100x. NLI is a deterministic stub by default, so everything except the
+# sentiment model runs offline; results go to a JSON file for comparing runs.
+# run from backend/: python -m benchmarks.pipeline [--scales 1 10 100] [--repeats 3] [--spacy blank] [--output run.json]
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+import analyzer
+import sentiment_analysis.nli_deberta_v3_base as nli
+import utils.context_window as context_window
+import utils.name_cleaning as name_cleaning
+from registry import registry, SPACY_MODEL_NAME
+from utils.pair_score_cache import shared_pair_score_cache
+from utils.roster_store import ROSTER_STORE_PATH
+
+TRANSCRIPT_PATH = "../resources/transcript.txt"
+SENTENCES_PATH = "../resources/sentences.json"
+DEFAULT_OUTPUT_DIR = "../outputs/benchmarks"
+
+class StubCrossEncoder:
+    # stands in for the CrossEncoder: same predict()/config surface, scores derived from a hash of each pair
+    config = SimpleNamespace(label2id={"contradiction": 0, "entailment": 1, "neutral": 2})
+
+    def predict(self, pairs: list[tuple[str, str]], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        scores = np.zeros((len(pairs), len(self.config.label2id)), dtype=np.float32)
+        for i, (premise, hypothesis) in enumerate(pairs):
+            scores[i, self.config.label2id["entailment"]] = (zlib.crc32(f"{premise}|{hypothesis}".encode("utf-8")) % 2000) / 200.0 - 5.0
+        return scores
+
+def load_blank_nlp(nfl_player_roster: dict):
+    # offline stand-in for en_core_web_md: sentencizer plus an entity ruler tagging every roster name and nickname
+    import spacy
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    ruler = nlp.add_pipe("entity_ruler")
+    names = set(nfl_player_roster) | set(name_cleaning.nickname_mappings)
+    ruler.add_patterns([{"label": "PERSON", "pattern": name} for name in sorted(names)])
+    return nlp
+
+def roster_names_in(text: str, nfl_player_roster: dict) -> list[str]:
+    # full two-word roster names that appear in text
+    roster_names = set(nfl_player_roster)
+    words = re.findall(r"[A-Za-z.'-]+", text)
+    found = {f"{first} {last}" for first, last in zip(words, words[1:]) if f"{first} {last}" in roster_names}
+    return sorted(found)
+
+def scale_transcript(transcript: str, scale: int, nfl_player_roster: dict, seed: int = 7) -> str:
+    # the bundled transcript repeated scale times; every copy after the first swaps each named player for a different
+    # roster player, so the copies add new players and windows instead of exact repeats the caches would absorb
+    if scale <= 1:
+        return transcript
+    rng = random.Random(seed)
+    mentioned = roster_names_in(transcript, nfl_player_roster)
+    # only swap in names that are a first and last name, like the ones they replace
+    candidates = [name for name in nfl_player_roster if len(name.split()) == 2]
+    copies = [transcript]
+    for _ in range(scale - 1):
+        replacements = dict(zip(mentioned, rng.sample(candidates, len(mentioned))))
+        pattern = re.compile(r"\b(" + "|".join(re.escape(name) for name in mentioned) + r")\b") if mentioned else None
+        copies.append(pattern.sub(lambda match: replacements[match.group(0)], transcript) if pattern else transcript)
+    return "\n\n".join(copies)
+
+def timed(run, repeats: int):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+    return result, {"min": min(timings), "median": statistics.median(timings), "runs": timings}
+
+def benchmark_scale(transcript: str, sentences: list[str], scale: int, repeats: int) -> dict:
+    scaled_transcript = scale_transcript(transcript, scale, registry.get_roster()[0])
+    stages = {}
+
+    (identified_names, raw_sentences, clean_sentences), stages["process_transcript"] = timed(
+        lambda: analyzer.process_transcript(podcast_transcript_text=scaled_transcript), repeats
+    )
+    # match_players_to_roster rewrites each mention's sentence in place, so every run gets fresh copies,
+    # and a fresh resolution cache (its default) so later runs don't just replay cached resolutions
+    final_player_object, stages["match_players_to_roster"] = timed(
+        lambda: analyzer.match_players_to_roster(
+            [dict(player_object) for player_object in identified_names], windows=context_window.ContextWindows(clean_sentences)
+        ), repeats
+    )
+    player_windows, stages["get_context_window"] = timed(
+        lambda: nli.gather_player_windows(final_player_object, context_window.ContextWindows(clean_sentences)), repeats
+    )
+    # every sentence of resources/sentences.json (repeated to scale) cleaned and windowed, independent of spaCy
+    scaled_sentences = [SimpleNamespace(text=sentence) for sentence in sentences] * scale
+
+    def window_every_sentence():
+        windows = context_window.ContextWindows(context_window.clean_sentences(scaled_sentences))
+        return [windows.get(i) for i in range(len(windows))]
+    _, stages["get_context_window_all_sentences"] = timed(window_every_sentence, repeats)
+
+    def run_sentiment():
+        # a cold pair cache per run, so every run scores the same pairs
+        shared_pair_score_cache.clear()
+        return nli.analyze_sentiment(final_player_object, context_window.ContextWindows(clean_sentences))
+    player_sentiments, stages["analyze_sentiment"] = timed(run_sentiment, repeats)
+
+    return {
+        "scale": scale,
+        "chars": len(scaled_transcript),
+        "sentences": len(raw_sentences),
+        "mentions": len(identified_names),
+        "players": len(final_player_object),
+        "windows": sum(len(player_text) for player_text in player_windows.values()),
+        "players_scored": len(player_sentiments),
+        "stages": stages,
+    }
+
+def environment(spacy_mode: str, nli_mode: str) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "spacy": SPACY_MODEL_NAME if spacy_mode == "model" else "blank+entity_ruler",
+        "nli": nli_mode,
+        "roster": ROSTER_STORE_PATH,
+        "roster_version": registry.get_roster()[1].version,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--spacy", choices=["model", "blank"], default="model",
+                        help=f"model: {SPACY_MODEL_NAME} via the registry; blank: offline sentencizer + roster entity ruler")
+    parser.add_argument("--nli", choices=["stub", "model"], default="stub", help="stub: hash-based scores, no model download")
+    parser.add_argument("--output", default=None, help=f"JSON results (default: {DEFAULT_OUTPUT_DIR}/pipeline_<timestamp>.json)")
+    args = parser.parse_args()
+
+    if args.spacy == "blank":
+        registry.resources["nlp"] = load_blank_nlp(registry.get_roster()[0])
+    if args.nli == "stub":
+        registry.resources["nli_model"] = StubCrossEncoder()
+
+    with open(TRANSCRIPT_PATH, "r", encoding="utf-8") as f:
+        transcript = f.read()
+    with open(SENTENCES_PATH, "r", encoding="utf-8") as f:
+        sentences = json.load(f)
+
+    # one untimed pass so model loading and first-call costs stay out of the numbers
+    analyzer.process_transcript(podcast_transcript_text=transcript[:2000])
+
+    report = {"environment": environment(args.spacy, args.nli), "repeats": args.repeats, "scales": []}
+    for scale in args.scales:
+        result = benchmark_scale(transcript, sentences, scale, args.repeats)
+        report["scales"].append(result)
+        stage_summary = ", ".join(f"{stage} {timing['min']:.3f}s" for stage, timing in result["stages"].items())
+        print(f"{scale:>4}x: {result['sentences']} sentences, {result['mentions']} mentions, {result['players']} players, "
+              f"{result['windows']} windows | {stage_summary}")
+
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"pipeline_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Microbenchmark of the indexed roster matcher against the linear process.extract scan.
+# run from backend/: python -m benchmarks.roster_matching [--queries 300]
+import argparse
+import random
+import time
+
+from fuzzywuzzy import fuzz
+from fuzzywuzzy import process
+
+from utils.roster_store import load_roster
+from utils.name_cleaning import nickname_mappings
+
+def make_queries(nfl_player_names: list[str], count: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    queries = list(nickname_mappings.keys()) + sorted(set(nickname_mappings.values()))
+    while len(queries) < count:
+        name = rng.choice(nfl_player_names)
+        kind = rng.random()
+        if kind < 0.3:
+            queries.append(name)
+        elif kind < 0.55:
+            # surname-only mention
+            queries.append(name.split()[-1])
+        elif kind < 0.85:
+            # ASR-style misspelling: drop or double one character
+            i = rng.randrange(1, len(name))
+            queries.append(name[:i] + name[i:][1:] if rng.random() < 0.5 else name[:i] + name[i-1] + name[i:])
+        else:
+            queries.append(rng.choice(["Chalky", "Nerd Herd", "Coach", "Bob Smith", "Zzyzx"]))
+    return queries[:count]
+
+def decide(closest_player_list: list[tuple[str, int]]) -> tuple[list[tuple[str, int]], str]:
+    # the 100 / >80 rule and statuses from analyzer.match_players_to_roster
+    possible_matches = [close_player for close_player in closest_player_list if close_player[1] == 100]
+    if len(possible_matches) < 1:
+        possible_matches = [close_player for close_player in closest_player_list if close_player[1] > 80]
+    if len(possible_matches) == 0:
+        return possible_matches, "no match"
+    return possible_matches, "perfect match" if len(possible_matches) == 1 else "best of multiple matches"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    nfl_player_roster, roster_index = load_roster()
+    print(f"loaded and indexed {len(roster_index)} roster names in {time.perf_counter() - start:.3f}s")
+    
+    nfl_player_names = list(nfl_player_roster.keys())
+    queries = make_queries(list(nfl_player_names), args.queries)
+    
+    start = time.perf_counter()
+    linear = [decide(process.extract(q, nfl_player_names, limit=5, scorer=fuzz.token_set_ratio)) for q in queries]
+    linear_elapsed = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    indexed = [decide(roster_index.extract(q, limit=5)) for q in queries]
+    indexed_elapsed = time.perf_counter() - start
+    
+    candidate_sizes = [len(roster_index.candidates(q)) for q in queries]
+    mismatches = [(q, a, b) for q, a, b in zip(queries, linear, indexed) if a != b]
+    
+    print(f"linear scan:   {len(queries) / linear_elapsed:10.1f} lookups/sec ({linear_elapsed:.3f}s)")
+    print(f"indexed:       {len(queries) / indexed_elapsed:10.1f} lookups/sec ({indexed_elapsed:.3f}s, "
+          f"speedup {linear_elapsed / indexed_elapsed:.1f}x)")
+    print(f"mean candidates per lookup: {sum(candidate_sizes) / len(candidate_sizes):.1f} of {len(roster_index)}")
+    print(f"decision agreement: {len(queries) - len(mismatches)}/{len(queries)}")
+    for q, a, b in mismatches[:10]:
+        print(f"  {q!r}: linear={a} indexed={b}")
+
+if __name__ == "__main__":
+    main()
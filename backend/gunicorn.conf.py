@@ -0,0 +1,27 @@
+# gunicorn settings for running app.py with several workers on one node. start the NLI server first, so the workers
+# share one copy of the model instead of loading one each:
+#   python -m sentiment_analysis.nli_server --address 127.0.0.1:8765 &
+#   NLI_SERVER_ADDRESS=127.0.0.1:8765 gunicorn app:app
+import gc
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+# request threads per worker; they all send their NLI pairs through the server's batcher
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+
+# import app.py once in the master: spaCy and the roster are loaded before the fork and shared copy-on-write
+preload_app = True
+os.environ.setdefault("REGISTRY_PRELOAD", "1")
+
+def when_ready(server):
+    # move everything loaded so far out of the collector's reach, so collections in the workers don't write to (and
+    # copy) the shared pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    # the sentiment model, or the NLI server connection, is per worker: torch's thread pool doesn't survive a fork
+    from registry import registry
+
+    registry.load_all_in_background(warm_up=True)
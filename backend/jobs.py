@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# at most JOB_WORKERS analyses run at once, and at most JOB_QUEUE_SIZE more wait behind them
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 8))
+# finished jobs kept around for GET /jobs/<id>; the oldest are dropped first
+JOB_HISTORY_SIZE = int(os.environ.get("JOB_HISTORY_SIZE", 100))
+
+class QueueFullError(Exception):
+    pass
+
+class Job:
+    def __init__(self, transcript: str, options: dict = None):
+        self.id = uuid.uuid4().hex
+        self.transcript = transcript
+        # extra keyword arguments for the run function, e.g. the sentiment engine
+        self.options = options or {}
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def update_progress(self, update: dict):
+        self.progress.update(update)
+
+    def to_dict(self) -> dict:
+        job = {
+            "id": self.id,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "succeeded":
+            job["result"] = self.result
+        if self.status == "failed":
+            job["error"] = self.error
+        return job
+
+class JobQueue:
+    # in-process backend: a bounded thread pool with a bounded backlog; submit raises QueueFullError instead of queueing forever
+    def __init__(self, run, max_workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_SIZE, history_size: int = JOB_HISTORY_SIZE):
+        self.run = run
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.history_size = history_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self.jobs = OrderedDict()
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def submit(self, transcript: str, **options) -> Job:
+        with self.lock:
+            if self.active >= self.max_workers + self.max_queued:
+                raise QueueFullError(f"{self.active} jobs already queued or running")
+            job = Job(transcript, options)
+            self.jobs[job.id] = job
+            self.active += 1
+            self._evict_finished()
+        self.executor.submit(self._execute, job)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self.lock:
+            statuses = [job.status for job in self.jobs.values()]
+            return {
+                "max_workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "queued": statuses.count("queued"),
+                "running": statuses.count("running"),
+                "succeeded": statuses.count("succeeded"),
+                "failed": statuses.count("failed"),
+            }
+
+    def _execute(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = self.run(job.transcript, progress=job.update_progress, **job.options)
+            job.status = "succeeded"
+        except Exception as e:
+            logger.exception("analysis job %s failed", job.id)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            # the transcript is no longer needed once the job is done
+            job.transcript = None
+            with self.lock:
+                self.active -= 1
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self.jobs[job_id]
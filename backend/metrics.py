@@ -0,0 +1,122 @@
+import contextvars
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, where the memory high-water mark is reported as 0
+    resource = None
+
+METRICS_PREFIX = "ffsa"
+
+# pipeline stages, in the order they run; stage() accepts others, these are just listed first in /metrics
+STAGES = ["read", "spacy_parse", "nickname_cleaning", "entity_extraction", "roster_match", "window_build", "nli_inference", "aggregation"]
+
+COUNTER_HELP = {
+    "requests": "Analysis requests",
+    "cached_requests": "Analysis requests answered from the result cache",
+    "sentences": "Sentences segmented",
+    "mentions": "Player name mentions extracted",
+    "players": "Distinct players matched to the roster",
+    "ambiguous_matches": "Mentions resolved as the best of multiple roster matches",
+    "recent_mention_matches": "Surname/first-name mentions resolved to a recently mentioned player",
+    "pronoun_mentions": "he/him/his sentences attributed to the player mentioned just before",
+    "nli_pairs": "(premise, hypothesis) pairs requested from the NLI scorer",
+    "nli_pairs_scored": "(premise, hypothesis) pairs that reached the NLI model",
+    "nli_batches": "NLI model calls made by the batch scheduler",
+    "nli_batch_pairs": "Pairs in the batch scheduler's model calls (divide by nli_batches for the mean batch size)",
+    "nli_request_batches": "Scheduler batches each scoring call's pairs were spread over",
+}
+
+def max_rss_bytes() -> int:
+    # process memory high-water mark; ru_maxrss is in kilobytes on Linux and bytes on macOS
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+class Profile:
+    # stage timings and counters of a single request, attached to the response when the caller asks for it
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.start_max_rss = max_rss_bytes()
+        self.stage_seconds = {}
+        self.counters = {}
+
+    def to_dict(self) -> dict:
+        end_max_rss = max_rss_bytes()
+        return {
+            "total_seconds": time.perf_counter() - self.started_at,
+            "stage_seconds": dict(self.stage_seconds),
+            "counters": dict(self.counters),
+            "max_rss_bytes": end_max_rss,
+            # how far this request pushed the process high-water mark (0 if it stayed under an earlier peak)
+            "max_rss_growth_bytes": end_max_rss - self.start_max_rss,
+        }
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+class Metrics:
+    # process-wide stage timers and counters, rendered in the Prometheus text format for /metrics
+    def __init__(self):
+        self.stage_seconds = {}
+        self.stage_counts = {}
+        self.counters = dict.fromkeys(COUNTER_HELP, 0)
+        self.lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+        profile = current_profile.get()
+        if profile is not None:
+            profile.stage_seconds[stage] = profile.stage_seconds.get(stage, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        profile = current_profile.get()
+        if profile is not None:
+            profile.counters[name] = profile.counters.get(name, 0) + value
+
+    def render(self) -> str:
+        with self.lock:
+            stages = STAGES + sorted(stage for stage in self.stage_seconds if stage not in STAGES)
+            lines = [
+                f"# HELP {METRICS_PREFIX}_stage_seconds Time spent in each analysis pipeline stage",
+                f"# TYPE {METRICS_PREFIX}_stage_seconds summary",
+            ]
+            for stage in stages:
+                lines.append(f'{METRICS_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {self.stage_seconds.get(stage, 0.0)}')
+                lines.append(f'{METRICS_PREFIX}_stage_seconds_count{{stage="{stage}"}} {self.stage_counts.get(stage, 0)}')
+            for name, value in self.counters.items():
+                lines.append(f"# HELP {METRICS_PREFIX}_{name}_total {COUNTER_HELP.get(name, name)}")
+                lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+                lines.append(f"{METRICS_PREFIX}_{name}_total {value}")
+        lines.append(f"# HELP {METRICS_PREFIX}_process_max_rss_bytes Process resident memory high-water mark")
+        lines.append(f"# TYPE {METRICS_PREFIX}_process_max_rss_bytes gauge")
+        lines.append(f"{METRICS_PREFIX}_process_max_rss_bytes {max_rss_bytes()}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(name, time.perf_counter() - start)
+
+@contextmanager
+def profiled():
+    # collects a Profile for everything run inside the block on this thread/context
+    profile = Profile()
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
@@ -0,0 +1,208 @@
+import logging
+import os
+import threading
+import time
+
+from utils.roster_store import load_roster
+
+logger = logging.getLogger(__name__)
+
+SPACY_MODEL_NAME = "en_core_web_md"
+NLI_MODEL_NAME = "cross-encoder/nli-deberta-v3-base"
+BART_MODEL_NAME = "facebook/bart-large-mnli"
+
+# lean NER mode: the components we never read are not loaded. the parser stays, it sets the sentence boundaries
+SPACY_LEAN_NER = os.environ.get("SPACY_LEAN_NER", "1") != "0"
+SPACY_LEAN_EXCLUDE = ["tagger", "attribute_ruler", "lemmatizer"]
+
+# NLI inference backend: "torch" (sentence-transformers CrossEncoder), "onnx" or "onnx-int8" (ONNX Runtime on CPU,
+# exported to NLI_ONNX_DIR on first load, dynamically quantized for onnx-int8)
+NLI_BACKEND = os.environ.get("NLI_BACKEND", "torch")
+NLI_BACKENDS = ["torch", "onnx", "onnx-int8"]
+NLI_ONNX_DIR = os.environ.get("NLI_ONNX_DIR", "../outputs/onnx/nli-deberta-v3-base")
+NLI_ONNX_THREADS = int(os.environ.get("NLI_ONNX_THREADS", os.cpu_count() or 1))
+# host:port or unix socket of a running NLI server; workers then share its model instead of each loading one
+NLI_SERVER_ADDRESS = os.environ.get("NLI_SERVER_ADDRESS")
+# score the in-process model's pairs through a cross-request batch scheduler (see sentiment_analysis.batching), so
+# concurrent requests share model calls; the NLI server always does
+NLI_BATCHING = os.environ.get("NLI_BATCHING", "1") != "0"
+# "1" loads the shared resources (spaCy, roster) synchronously at import, for gunicorn's preload_app (see gunicorn.conf.py)
+REGISTRY_PRELOAD = os.environ.get("REGISTRY_PRELOAD", "0") != "0"
+
+# sentiment engine used when a request doesn't pick one (see sentiment_analysis.engines); only its model loads at startup
+SENTIMENT_ENGINE = os.environ.get("SENTIMENT_ENGINE", "deberta")
+
+SHARED_RESOURCES = ["nlp", "roster"]
+
+WARM_UP_PLAYER = "Brock Bowers"
+WARM_UP_TEXT = "Like, dude, Brock Bowers is getting all the targets. He was tight end one last year."
+
+def load_nlp():
+    import spacy
+
+    nlp = spacy.load(SPACY_MODEL_NAME, exclude=SPACY_LEAN_EXCLUDE if SPACY_LEAN_NER else [])
+    # after the parser, the sentencizer only fills in boundaries on docs the parser left unset
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+def load_nli_model(backend: str = None):
+    # with NLI_SERVER_ADDRESS set, the model lives in the NLI server process (sentiment_analysis.nli_server)
+    if NLI_SERVER_ADDRESS and backend is None:
+        from sentiment_analysis.nli_server import RemoteCrossEncoder
+
+        return RemoteCrossEncoder(NLI_SERVER_ADDRESS)
+    model = load_local_nli_model(backend)
+    # an explicit backend (benchmarks) gets the bare model
+    if NLI_BATCHING and backend is None:
+        from sentiment_analysis.batching import BatchScheduler
+
+        return BatchScheduler(model)
+    return model
+
+def load_local_nli_model(backend: str = None):
+    backend = backend or NLI_BACKEND
+    if backend == "torch":
+        from sentence_transformers import CrossEncoder
+
+        return CrossEncoder(NLI_MODEL_NAME)
+    if backend in ("onnx", "onnx-int8"):
+        from sentiment_analysis.onnx_backend import load_onnx_model
+
+        return load_onnx_model(NLI_MODEL_NAME, NLI_ONNX_DIR, quantize=backend == "onnx-int8", intra_op_threads=NLI_ONNX_THREADS)
+    raise ValueError(f"Unknown NLI_BACKEND {backend!r}, expected one of {NLI_BACKENDS}")
+
+def load_bart_classifier():
+    from transformers import pipeline
+
+    return pipeline("zero-shot-classification", model=BART_MODEL_NAME)
+
+def load_fast_tier():
+    from sentiment_analysis.fast_tier import FastTierModel, FAST_TIER_WEIGHTS_PATH
+
+    return FastTierModel.load(FAST_TIER_WEIGHTS_PATH)
+
+class ResourceRegistry:
+    # loads each heavy resource once per process and keeps load/warm-up timings for /ready
+    def __init__(self):
+        self.loaders = {
+            "nlp": load_nlp,
+            "roster": load_roster,
+            "nli_model": load_nli_model,
+            "bart_classifier": load_bart_classifier,
+            "fast_tier": load_fast_tier,
+        }
+        self.resources = {}
+        self.load_seconds = {}
+        self.warm_up_seconds = {}
+        self.errors = {}
+        self.warmed_up = False
+        self.loading_started_at = None
+        self.ready_at = None
+        self.lock = threading.RLock()
+
+    def get(self, name: str):
+        resource = self.resources.get(name)
+        if resource is not None:
+            return resource
+
+        with self.lock:
+            if name not in self.resources:
+                start = time.perf_counter()
+                try:
+                    self.resources[name] = self.loaders[name]()
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    raise
+                self.errors.pop(name, None)
+                self.load_seconds[name] = time.perf_counter() - start
+                logger.info("loaded %s in %.2fs", name, self.load_seconds[name])
+            return self.resources[name]
+
+    def get_nlp(self):
+        return self.get("nlp")
+
+    def get_roster(self):
+        # (nfl_player_roster, roster_index)
+        return self.get("roster")
+
+    def get_nli_model(self):
+        return self.get("nli_model")
+
+    def get_bart_classifier(self):
+        return self.get("bart_classifier")
+
+    def get_fast_tier(self):
+        return self.get("fast_tier")
+
+    def startup_resources(self) -> list[str]:
+        # everything a request needs with the default engine; other engines' models load on first use
+        from sentiment_analysis.engines import get_engine
+
+        return ["nlp", "roster", get_engine().resource]
+
+    def load_shared(self):
+        # spaCy and the roster hold no threads or sockets, so a gunicorn master can load them once and fork; the
+        # sentiment model (or the NLI server connection) is loaded by each worker after the fork
+        for name in SHARED_RESOURCES:
+            self.get(name)
+
+    def reload(self, name: str):
+        with self.lock:
+            self.resources.pop(name, None)
+            return self.get(name)
+
+    def warm_up(self):
+        # run one tiny inference through each resource so the first real request doesn't pay allocation/JIT costs
+        from sentiment_analysis.engines import get_engine
+
+        start = time.perf_counter()
+        self.get_nlp()(WARM_UP_TEXT)
+        self.warm_up_seconds["nlp"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, roster_index = self.get_roster()
+        roster_index.extract(WARM_UP_PLAYER)
+        self.warm_up_seconds["roster"] = time.perf_counter() - start
+
+        engine = get_engine()
+        start = time.perf_counter()
+        engine.score([WARM_UP_TEXT], WARM_UP_PLAYER)
+        self.warm_up_seconds[engine.resource] = time.perf_counter() - start
+
+        self.warmed_up = True
+
+    def load_all(self, warm_up: bool = True):
+        self.loading_started_at = time.time()
+        try:
+            for name in self.startup_resources():
+                self.get(name)
+            if warm_up:
+                self.warm_up()
+            self.ready_at = time.time()
+        except Exception as e:
+            logger.error("resource loading failed: %s", e)
+
+    def load_all_in_background(self, warm_up: bool = True) -> threading.Thread:
+        thread = threading.Thread(target=self.load_all, kwargs={"warm_up": warm_up}, name="resource-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self) -> bool:
+        return self.ready_at is not None and all(name in self.resources for name in self.startup_resources())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.is_ready(),
+            "loaded": sorted(self.resources.keys()),
+            "nli_backend": NLI_BACKEND,
+            "nli_server": NLI_SERVER_ADDRESS,
+            "nli_batching": NLI_BATCHING,
+            "sentiment_engine": SENTIMENT_ENGINE,
+            "warmed_up": self.warmed_up,
+            "load_seconds": dict(self.load_seconds),
+            "warm_up_seconds": dict(self.warm_up_seconds),
+            "startup_seconds": (self.ready_at - self.loading_started_at) if self.ready_at and self.loading_started_at else None,
+            "errors": dict(self.errors),
+        }
+
+registry = ResourceRegistry()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import utils.coreference as coreference
+import utils.name_cleaning as name_cleaning
+from utils.timed_transcript import TimedTranscript
+from utils.roster_index import TEAM_MENTION_BOOST
+from sentiment_analysis.engines import get_engine
+from registry import registry, SPACY_MODEL_NAME, SPACY_LEAN_NER, SPACY_LEAN_EXCLUDE
+
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 64))
+# optional on-disk tier that survives restarts and is shared by every worker on the node
+RESULT_CACHE_DISK = os.environ.get("RESULT_CACHE_DISK", "0") != "0"
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "../outputs/cache/results.sqlite3")
+
+def pipeline_fingerprint(engine: str = None) -> dict:
+    # everything besides the transcript that changes what /analyze returns
+    _, roster_index = registry.get_roster()
+    return {
+        "roster_version": roster_index.version,
+        "roster_match_positions": sorted(roster_index.positions) if roster_index.positions is not None else "all",
+        "team_mention_boost": TEAM_MENTION_BOOST,
+        "coreference": {
+            "entity_table_size": coreference.ENTITY_TABLE_SIZE,
+            "pronouns": coreference.COREFERENCE_PRONOUNS,
+            "pronoun_max_distance": coreference.PRONOUN_MAX_DISTANCE,
+        },
+        "nicknames_version": name_cleaning.nickname_matcher.version,
+        "spacy_model": SPACY_MODEL_NAME,
+        "spacy_excluded": SPACY_LEAN_EXCLUDE if SPACY_LEAN_NER else [],
+        "sentiment_engine": get_engine(engine).fingerprint(),
+    }
+
+def make_key(kind: str, transcript: str | TimedTranscript, engine: str = None) -> str:
+    if isinstance(transcript, TimedTranscript):
+        # segment timings end up in the result, so they are part of the key
+        kind = f"{kind}:timed"
+        transcript_sha256 = transcript.fingerprint()
+    else:
+        transcript_sha256 = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+    key_material = {
+        "kind": kind,
+        "transcript_sha256": transcript_sha256,
+        **pipeline_fingerprint(engine),
+    }
+    return hashlib.sha256(json.dumps(key_material, sort_keys=True).encode("utf-8")).hexdigest()
+
+class DiskTier:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, created_at REAL, value BLOB)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key: str):
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, key: str, result):
+        value = zlib.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+        with self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO results (key, created_at, value) VALUES (?, ?, ?)", (key, time.time(), value))
+
+class ResultCache:
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, disk_path: str = None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.disk = DiskTier(disk_path) if disk_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.memory_hits += 1
+                return result
+
+        result = self.disk.get(key) if self.disk else None
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, result)
+        return result
+
+    def put(self, key: str, result):
+        self._remember(key, result)
+        if self.disk:
+            self.disk.put(key, result)
+
+    def _remember(self, key: str, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "disk_tier": self.disk.path if self.disk else None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+result_cache = ResultCache(disk_path=RESULT_CACHE_PATH if RESULT_CACHE_DISK else None)
@@ -1,43 +1,23 @@
-from transformers import pipeline
 import numpy as np
-import utils.context_window as context_window
+from registry import registry
 
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+# zero-shot labels, in the same order as the common candidate labels (positive, negative, neutral)
+zero_shot_labels = ["praise", "criticism", "neutral"]
 
-def aggregate_results(results: list[dict]) -> dict: 
-    scores = {label: [] for label in results[0]['labels']}
-    
-    for result in results:
-        for label, score in zip(result['labels'], result['scores']):
-            scores[label].append(score)
-    
-    return {label: np.mean(aggregated_scores) for label, aggregated_scores in scores.items()}
+DEFAULT_BATCH_SIZE = 16
 
-def analyze_sentiment(final_player_object: dict, raw_sentences: list[str]):
-    sentiment_object = {}
-    for player in final_player_object:
-        """
-            text = [...]
-            candidate_labels = ["praise", "criticism", "neutral"]
+def score_windows(windows: list[tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+    # windows is a flat list of (player, text); returns label probabilities of shape (len(windows), len(zero_shot_labels)).
+    # the zero-shot hypothesis ("This example is praise.") doesn't name the player, so only the text is classified
+    if len(windows) == 0:
+        return np.empty((0, len(zero_shot_labels)))
 
-            result = classifier(text, candidate_labels)
-            print(result)
-        """
-        player_text = []
-        for sentence_index in final_player_object[player]['mentioned_sentence_indexes']:
-            sentence_with_context = context_window.get_context_window(sentence_index, raw_sentences, window_size=2)
-            player_text.append(sentence_with_context)
-            
-        candidate_labels = ["praise", "criticism", "neutral"]
-        result = classifier(player_text, candidate_labels)
-        
-        sentiment_consensus = aggregate_results(result)
-        sentiment_object[player] = {
-            "sentiment_consensus": sentiment_consensus,
-            "detailed_sentiment": result,
-            "status": final_player_object[player]['occurrence_array'][0]['status'],
-            "transcript_name": final_player_object[player]['occurrence_array'][0]['transcript_name']
-            # "occurrences": final_player_object[player]['occurrence_array']
-        }
-    
-    return sentiment_object
\ No newline at end of file
+    classifier = registry.get_bart_classifier()
+    results = classifier([text for _, text in windows], zero_shot_labels, batch_size=batch_size)
+    if isinstance(results, dict):
+        results = [results]
+
+    # the pipeline sorts labels by score, so put the columns back in zero_shot_labels order
+    return np.array([
+        [dict(zip(result['labels'], result['scores']))[label] for label in zero_shot_labels] for result in results
+    ])
@@ -0,0 +1,266 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# a batch is run as soon as it holds this many pairs, or once its oldest pair has waited its lane's max wait
+NLI_BATCH_MAX_SIZE = int(os.environ.get("NLI_BATCH_MAX_SIZE", 64))
+NLI_BATCH_MAX_WAIT_MS = float(os.environ.get("NLI_BATCH_MAX_WAIT_MS", 10))
+# backfill (async jobs, batch runs) can wait longer for a full batch
+NLI_BACKFILL_MAX_WAIT_MS = float(os.environ.get("NLI_BACKFILL_MAX_WAIT_MS", 50))
+# share of every batch kept for backfill pairs while interactive traffic is queued, so backfill never starves
+NLI_BACKFILL_MIN_SHARE = float(os.environ.get("NLI_BACKFILL_MIN_SHARE", 0.25))
+# longest a caller waits for its pairs before giving up on the scheduler
+NLI_BATCH_TIMEOUT_SECONDS = float(os.environ.get("NLI_BATCH_TIMEOUT_SECONDS", 300))
+
+LANES = ["interactive", "backfill"]
+
+# lane of the pairs scored in this thread/context; jobs and batch runs switch to "backfill"
+current_lane = contextvars.ContextVar("nli_lane", default="interactive")
+
+@contextmanager
+def lane(name: str):
+    if name not in LANES:
+        raise ValueError(f"Unknown NLI lane {name!r}, expected one of {LANES}")
+    token = current_lane.set(name)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+class BatchRequest:
+    # one caller's pairs, waiting for their rows of logits
+    def __init__(self, pairs: list[tuple[str, str]], lane: str):
+        self.pairs = pairs
+        self.lane = lane
+        self.submitted_at = time.perf_counter()
+        self.rows = [None] * len(pairs)
+        # pairs before next_index have been put in a batch
+        self.next_index = 0
+        self.remaining = len(pairs)
+        self.batches = 0
+        self.last_batch = None
+        self.dispatched_at = None
+        self.error = None
+        self.done = threading.Event()
+
+    def queue_wait(self) -> float:
+        # from submission until the last of its pairs left the queue
+        return (self.dispatched_at or self.submitted_at) - self.submitted_at
+
+class BatchScheduler:
+    # collects (premise, hypothesis) pairs from concurrent callers into shared model.predict batches. interactive pairs
+    # go first, backfill gets NLI_BACKFILL_MIN_SHARE of a batch while interactive pairs wait and all the room they leave.
+    # within a lane requests take turns, a fair share of the batch each, so one huge transcript can't hold up small
+    # ones. has the model's predict()/config surface, so score_windows uses it like the model itself
+    def __init__(self, model, max_batch_size: int = NLI_BATCH_MAX_SIZE, max_wait_ms: float = NLI_BATCH_MAX_WAIT_MS,
+                 backfill_max_wait_ms: float = NLI_BACKFILL_MAX_WAIT_MS, backfill_min_share: float = NLI_BACKFILL_MIN_SHARE,
+                 timeout_seconds: float = NLI_BATCH_TIMEOUT_SECONDS):
+        self.model = model
+        self.config = model.config
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = {"interactive": max_wait_ms / 1000, "backfill": backfill_max_wait_ms / 1000}
+        self.backfill_min_share = backfill_min_share
+        self.timeout_seconds = timeout_seconds
+        # requests with pairs still queued, in turn order
+        self.lanes = {name: deque() for name in LANES}
+        self.pending_pairs = dict.fromkeys(LANES, 0)
+        self.condition = threading.Condition()
+        self.requests = dict.fromkeys(LANES, 0)
+        self.pairs = dict.fromkeys(LANES, 0)
+        self.queue_wait_seconds = dict.fromkeys(LANES, 0.0)
+        self.max_queue_wait_seconds = dict.fromkeys(LANES, 0.0)
+        self.batches = 0
+        self.batches_formed = 0
+        self.batched_pairs = 0
+        self.predict_seconds = 0.0
+        self.thread = threading.Thread(target=self._run, name="nli-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, pairs: list[tuple[str, str]], lane: str = None) -> BatchRequest:
+        # blocks until every pair is scored
+        request = BatchRequest(list(pairs), lane or current_lane.get())
+        if len(request.pairs) == 0:
+            request.done.set()
+            return request
+        with self.condition:
+            self.lanes[request.lane].append(request)
+            self.pending_pairs[request.lane] += len(request.pairs)
+            self.requests[request.lane] += 1
+            self.pairs[request.lane] += len(request.pairs)
+            self.condition.notify()
+        if not request.done.wait(self.timeout_seconds):
+            with self.condition:
+                if not request.done.is_set():
+                    self._fail(request, TimeoutError(f"NLI pairs not scored within {self.timeout_seconds:g}s"))
+                    raise request.error
+        if request.error is not None:
+            raise request.error
+        return request
+
+    def predict(self, pairs: list[tuple[str, str]], batch_size: int = None, show_progress_bar: bool = False) -> np.ndarray:
+        # batch_size is replaced by the scheduler's batches
+        request = self.submit(pairs)
+        record_queue_wait(request.queue_wait(), request.batches)
+        if len(request.rows) == 0:
+            return np.empty((0, len(self.config.label2id)), dtype=np.float32)
+        return np.array(request.rows, dtype=np.float32)
+
+    def _dispatch_deadline(self) -> float:
+        # the earliest moment some lane's oldest pair has waited its max wait
+        return min(
+            min(request.submitted_at for request in self.lanes[name]) + self.max_wait_seconds[name]
+            for name in LANES if self.pending_pairs[name] > 0
+        )
+
+    def _take(self, lane_name: str, capacity: int) -> list:
+        # round robin over the lane's requests, each getting an equal share of what's left of the batch
+        requests = self.lanes[lane_name]
+        batch = []
+        while capacity > 0 and len(requests) > 0:
+            share = max(1, capacity // len(requests))
+            for _ in range(len(requests)):
+                if capacity == 0:
+                    break
+                request = requests.popleft()
+                count = min(share, len(request.pairs) - request.next_index, capacity)
+                batch.extend((request, i) for i in range(request.next_index, request.next_index + count))
+                request.next_index += count
+                # a request can get more than one turn in a batch
+                if request.last_batch != self.batches_formed:
+                    request.last_batch = self.batches_formed
+                    request.batches += 1
+                capacity -= count
+                if request.next_index < len(request.pairs):
+                    # back of the line
+                    requests.append(request)
+                else:
+                    request.dispatched_at = time.perf_counter()
+        self.pending_pairs[lane_name] -= len(batch)
+        return batch
+
+    def _next_batch(self) -> list:
+        with self.condition:
+            while sum(self.pending_pairs.values()) == 0:
+                self.condition.wait()
+            while sum(self.pending_pairs.values()) < self.max_batch_size:
+                remaining = self._dispatch_deadline() - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+
+            self.batches_formed += 1
+            backfill_reserved = 0
+            if self.pending_pairs["interactive"] > 0:
+                backfill_reserved = min(self.pending_pairs["backfill"], int(self.max_batch_size * self.backfill_min_share))
+            batch = self._take("interactive", self.max_batch_size - backfill_reserved)
+            batch.extend(self._take("backfill", self.max_batch_size - len(batch)))
+            return batch
+
+    def _predict(self, pairs: list[tuple[str, str]]) -> dict:
+        # pair -> row of logits; a model returning the wrong number of rows is an error, not a silent misalignment
+        scores = np.asarray(self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False))
+        if len(scores) != len(pairs):
+            raise ValueError(f"NLI model returned {len(scores)} rows for {len(pairs)} pairs")
+        return dict(zip(pairs, scores))
+
+    def _score(self, batch: list) -> tuple[dict, dict]:
+        # (pair -> row, request -> error). when the batch fails, each request's pairs are scored on their own, so
+        # only the request whose pairs break the model fails rather than everyone sharing its batch
+        unique_pairs = list(dict.fromkeys(request.pairs[i] for request, i in batch))
+        metrics.count("nli_batches")
+        metrics.count("nli_batch_pairs", len(unique_pairs))
+        try:
+            return self._predict(unique_pairs), {}
+        except Exception:
+            logger.warning("NLI batch of %d pairs failed, retrying each request on its own", len(unique_pairs), exc_info=True)
+
+        pairs_by_request = {}
+        for request, i in batch:
+            pairs_by_request.setdefault(request, {})[request.pairs[i]] = None
+        rows, errors = {}, {}
+        for request, request_pairs in pairs_by_request.items():
+            try:
+                rows.update(self._predict(list(request_pairs)))
+            except Exception as e:
+                errors[request] = e
+        return rows, errors
+
+    def _fail(self, request: BatchRequest, error: Exception):
+        # called holding the condition; the rest of a failed request's pairs are dropped from its lane
+        request.error = error
+        if request in self.lanes[request.lane]:
+            self.lanes[request.lane].remove(request)
+            self.pending_pairs[request.lane] -= len(request.pairs) - request.next_index
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            start = time.perf_counter()
+            try:
+                rows, errors = self._score(batch)
+            except Exception as e:
+                # anything unexpected fails this batch's requests; the thread keeps serving the next batches
+                logger.exception("NLI batch failed")
+                rows, errors = {}, {request: e for request, _ in batch}
+            seconds = time.perf_counter() - start
+
+            finished = []
+            with self.condition:
+                self.batches += 1
+                self.batched_pairs += len(rows)
+                self.predict_seconds += seconds
+                for request, i in batch:
+                    if request.done.is_set() or request in finished:
+                        continue
+                    if request in errors:
+                        self._fail(request, errors[request])
+                        finished.append(request)
+                        continue
+                    request.rows[i] = rows[request.pairs[i]]
+                    request.remaining -= 1
+                    if request.remaining == 0:
+                        finished.append(request)
+                for request in finished:
+                    self.queue_wait_seconds[request.lane] += request.queue_wait()
+                    self.max_queue_wait_seconds[request.lane] = max(self.max_queue_wait_seconds[request.lane], request.queue_wait())
+            for request in finished:
+                request.done.set()
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": {name: seconds * 1000 for name, seconds in self.max_wait_seconds.items()},
+                "backfill_min_share": self.backfill_min_share,
+                "batches": self.batches,
+                "mean_batch_size": self.batched_pairs / self.batches if self.batches > 0 else 0.0,
+                # how full the model's batches were; low under light traffic, when batches leave on the deadline
+                "fill_rate": self.batched_pairs / (self.batches * self.max_batch_size) if self.batches > 0 else 0.0,
+                "predict_seconds": self.predict_seconds,
+                "lanes": {
+                    name: {
+                        "requests": self.requests[name],
+                        "pairs": self.pairs[name],
+                        "pending_requests": len(self.lanes[name]),
+                        "pending_pairs": self.pending_pairs[name],
+                        "mean_queue_wait_seconds": self.queue_wait_seconds[name] / self.requests[name] if self.requests[name] > 0 else 0.0,
+                        "max_queue_wait_seconds": self.max_queue_wait_seconds[name],
+                    }
+                    for name in LANES
+                },
+            }
+
+def record_queue_wait(seconds: float, batches: int):
+    # in the caller's thread, so it lands in the request's profile as well as /metrics
+    metrics.observe("nli_queue_wait", seconds)
+    metrics.count("nli_request_batches", batches)
@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+import sentiment_analysis.bart_large_mnli as bart
+import sentiment_analysis.fast_tier as fast_tier
+import sentiment_analysis.nli_deberta_v3_base as nli
+import utils.context_window as context_window
+from registry import registry, SENTIMENT_ENGINE, NLI_MODEL_NAME, NLI_BACKEND, NLI_SERVER_ADDRESS, BART_MODEL_NAME
+
+class SentimentEngine(ABC):
+    # common interface over the sentiment models: score() returns one row per window with columns in
+    # nli.candidate_labels order, and every engine's results share the schema of nli.build_player_sentiment.
+    # the model behind an engine is a registry resource, loaded the first time the engine scores something
+    name = None
+    resource = None
+    batch_size = nli.DEFAULT_BATCH_SIZE
+
+    def score(self, windows: list, player: str = None) -> np.ndarray:
+        # windows are (player, text) pairs, or texts that all mention player
+        if player is not None:
+            windows = [(player, text) for text in windows]
+        return self.score_pairs(windows, batch_size=self.batch_size)
+
+    @abstractmethod
+    def score_pairs(self, windows: list[tuple[str, str]], batch_size: int) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def fingerprint(self) -> dict:
+        # everything about the engine that changes its results, for the result cache key
+        pass
+
+    def iter_player_sentiments(self, final_player_object: dict, windows: context_window.ContextWindows, players: list[str] = None):
+        for player, sentiment in nli.iter_player_sentiments(final_player_object, windows, batch_size=self.batch_size, players=players, score=self.score_pairs):
+            sentiment['engine'] = self.name
+            yield player, sentiment
+
+    def analyze_sentiment(self, final_player_object: dict, windows: context_window.ContextWindows, progress=None) -> dict:
+        sentiment_object = {}
+        for player, sentiment in self.iter_player_sentiments(final_player_object, windows):
+            sentiment_object[player] = sentiment
+            if progress is not None:
+                progress({"players_scored": len(sentiment_object)})
+        return sentiment_object
+
+class DebertaEngine(SentimentEngine):
+    # cross-encoder entailment logits for one player-specific hypothesis per label
+    name = "deberta"
+    resource = "nli_model"
+
+    def score_pairs(self, windows: list[tuple[str, str]], batch_size: int) -> np.ndarray:
+        return nli.score_windows(windows, batch_size=batch_size)
+
+    def fingerprint(self) -> dict:
+        return {
+            "engine": self.name,
+            "model": NLI_MODEL_NAME,
+            # int8 scores differ slightly from fp32 ones; behind an NLI server, its backend is the one that counts
+            "nli_backend": registry.get_nli_model().backend if NLI_SERVER_ADDRESS else NLI_BACKEND,
+            "labels": nli.candidate_labels,
+            "hypotheses": [nli.make_hypotheses("{player}", label) for label in nli.candidate_labels],
+        }
+
+class BartEngine(SentimentEngine):
+    # zero-shot label probabilities; praise/criticism/neutral map onto positive/negative/neutral
+    name = "bart"
+    resource = "bart_classifier"
+    batch_size = bart.DEFAULT_BATCH_SIZE
+
+    def score_pairs(self, windows: list[tuple[str, str]], batch_size: int) -> np.ndarray:
+        return bart.score_windows(windows, batch_size=batch_size)
+
+    def fingerprint(self) -> dict:
+        return {
+            "engine": self.name,
+            "model": BART_MODEL_NAME,
+            "labels": bart.zero_shot_labels,
+        }
+
+class TieredEngine(SentimentEngine):
+    # every window goes through the fast tier (a linear model on spaCy word vectors); windows whose top probability
+    # is below threshold are escalated to DeBERTa. scores are label probabilities, so escalated windows get a softmax
+    # over DeBERTa's per-label entailment logits to stay on the same scale
+    name = "tiered"
+    resource = "fast_tier"
+
+    def __init__(self, threshold: float = fast_tier.FAST_TIER_THRESHOLD):
+        self.threshold = threshold
+        self.full_engine = DebertaEngine()
+        self.windows_scored = 0
+        self.windows_escalated = 0
+        self.fast_seconds = 0.0
+        self.full_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def score_pairs(self, windows: list[tuple[str, str]], batch_size: int) -> np.ndarray:
+        if len(windows) == 0:
+            return np.empty((0, len(nli.candidate_labels)))
+
+        start = time.perf_counter()
+        features = fast_tier.window_features(windows, registry.get_nlp())
+        probabilities = registry.get_fast_tier().predict_proba(features)
+        escalate = np.max(probabilities, axis=1) < self.threshold
+        fast_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if np.any(escalate):
+            escalated_windows = [window for window, escalated in zip(windows, escalate) if escalated]
+            probabilities[escalate] = fast_tier.softmax(self.full_engine.score_pairs(escalated_windows, batch_size=batch_size))
+        full_seconds = time.perf_counter() - start
+
+        with self.lock:
+            self.windows_scored += len(windows)
+            self.windows_escalated += int(np.sum(escalate))
+            self.fast_seconds += fast_seconds
+            self.full_seconds += full_seconds
+        return probabilities
+
+    def fingerprint(self) -> dict:
+        return {
+            "engine": self.name,
+            "fast_tier_version": registry.get_fast_tier().version,
+            "threshold": self.threshold,
+            "full": self.full_engine.fingerprint(),
+        }
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "threshold": self.threshold,
+                "windows_scored": self.windows_scored,
+                "windows_escalated": self.windows_escalated,
+                "escalation_rate": self.windows_escalated / self.windows_scored if self.windows_scored > 0 else 0.0,
+                "fast_seconds": self.fast_seconds,
+                "full_seconds": self.full_seconds,
+            }
+
+def available_engines() -> list[SentimentEngine]:
+    # the tiered engine needs fast tier weights trained by train_fast_tier.py; without them it isn't offered at all
+    available = [DebertaEngine(), BartEngine()]
+    if os.path.exists(fast_tier.FAST_TIER_WEIGHTS_PATH):
+        available.append(TieredEngine())
+    return available
+
+engines = {engine.name: engine for engine in available_engines()}
+
+def get_engine(name: str = None) -> SentimentEngine:
+    name = name or SENTIMENT_ENGINE
+    if name == TieredEngine.name and name not in engines:
+        raise ValueError(f"Sentiment engine {name!r} needs {fast_tier.FAST_TIER_WEIGHTS_PATH}, train it with train_fast_tier.py")
+    if name not in engines:
+        raise ValueError(f"Unknown sentiment engine {name!r}, expected one of {sorted(engines)}")
+    return engines[name]
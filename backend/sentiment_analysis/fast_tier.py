@@ -0,0 +1,79 @@
+import hashlib
+import os
+
+import numpy as np
+
+FAST_TIER_WEIGHTS_PATH = os.environ.get("FAST_TIER_WEIGHTS", "../resources/fast_tier.npz")
+# windows whose top fast-tier probability is below this are escalated to the full DeBERTa model
+FAST_TIER_THRESHOLD = float(os.environ.get("FAST_TIER_THRESHOLD", 0.8))
+# tokens this close to the player's last name make up the mention vector
+MENTION_RADIUS = 12
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - np.max(logits, axis=1, keepdims=True))
+    return shifted / np.sum(shifted, axis=1, keepdims=True)
+
+def mean_vector(tokens, width: int) -> np.ndarray:
+    vectors = [token.vector for token in tokens if token.has_vector]
+    if len(vectors) == 0:
+        return np.zeros(width, dtype=np.float32)
+    vector = np.mean(vectors, axis=0)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def window_features(windows: list[tuple[str, str]], nlp) -> np.ndarray:
+    # static en_core_web_md word vectors only (the tokenizer and vocab lookups, none of the pipeline components):
+    # the mean vector of the whole window, then the mean vector around the player's mentions, so two players
+    # sharing a window can still score differently
+    width = nlp.vocab.vectors_length
+    rows = []
+    for (player, _), doc in zip(windows, nlp.tokenizer.pipe(text for _, text in windows)):
+        last_name = player.split()[-1].lower()
+        mention_tokens = set()
+        for token in doc:
+            if token.lower_ == last_name:
+                mention_tokens.update(range(max(0, token.i - MENTION_RADIUS), min(len(doc), token.i + MENTION_RADIUS + 1)))
+        window_vector = mean_vector(doc, width)
+        mention_vector = mean_vector([doc[i] for i in sorted(mention_tokens)], width) if mention_tokens else window_vector
+        rows.append(np.concatenate([window_vector, mention_vector]))
+    return np.array(rows, dtype=np.float32).reshape(len(windows), 2 * width)
+
+class FastTierModel:
+    # multinomial logistic regression over window_features, distilled from the full model's labels (train_fast_tier.py)
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: list[str], version: str = None):
+        self.weights = weights
+        self.bias = bias
+        self.labels = labels
+        self.version = version
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        return softmax(features @ self.weights + self.bias)
+
+    def save(self, path: str):
+        np.savez(path, weights=self.weights, bias=self.bias, labels=np.array(self.labels))
+
+    @classmethod
+    def load(cls, path: str) -> "FastTierModel":
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No fast tier weights at {path}, train them with python train_fast_tier.py")
+        with open(path, "rb") as f:
+            version = hashlib.sha1(f.read()).hexdigest()[:12]
+        data = np.load(path)
+        return cls(data["weights"], data["bias"], [str(label) for label in data["labels"]], version=version)
+
+def train(features: np.ndarray, label_indexes: np.ndarray, labels: list[str], l2: float = 1e-3, epochs: int = 500, learning_rate: float = 0.5) -> FastTierModel:
+    # full-batch gradient descent on cross-entropy; classes are weighted so a transcript that is mostly neutral
+    # doesn't teach the model to always answer neutral
+    n, width = features.shape
+    targets = np.zeros((n, len(labels)), dtype=np.float32)
+    targets[np.arange(n), label_indexes] = 1.0
+    counts = np.maximum(targets.sum(axis=0), 1.0)
+    sample_weights = (targets @ (n / (len(labels) * counts)))[:, None]
+
+    weights = np.zeros((width, len(labels)), dtype=np.float32)
+    bias = np.zeros(len(labels), dtype=np.float32)
+    for _ in range(epochs):
+        gradient = sample_weights * (softmax(features @ weights + bias) - targets) / n
+        weights -= learning_rate * (features.T @ gradient + l2 * weights)
+        bias -= learning_rate * gradient.sum(axis=0)
+    return FastTierModel(weights, bias, labels)
@@ -1,72 +1,157 @@
-from sentence_transformers import CrossEncoder
 import numpy as np
 import statistics
+import time
 import utils.context_window as context_window
+from utils.pair_score_cache import PairScoreCache, default_pair_score_cache
+from registry import registry
+from metrics import metrics, stage
 
-model = CrossEncoder('cross-encoder/nli-deberta-v3-base')
+candidate_labels = ["positive", "negative", "neutral"]
 
-def analyze_sentiment(final_player_object: dict, raw_sentences: list[str]):
-    sentiment_object = {}
-    
+# number of (context, hypothesis) pairs sent through the CrossEncoder per forward pass
+DEFAULT_BATCH_SIZE = 32
+# players are scored in groups of about this many full batches, so results can be reported before the whole transcript is done
+SCORING_GROUP_BATCHES = 4
+
+def make_hypotheses(player, label):
+    if label == "positive":
+        return f"{player} will perform at a high level or positively influence fantasy points."
+    elif label == "negative":
+        return f"{player} will perform at a low level or negatively impact fantasy points."
+    else:
+        return f"{player} will perform as average or neutrally impact fantasy points."
+    """
+    if label == "positive":
+        return f"{player} will perform at a high level and positively influence fantasy points."
+    elif label == "negative":
+        return f"{player} will underperform or negatively impact fantasy points."
+    else:
+        return f"{player} will have an average or neutral impact."
+    """
+
+@stage("window_build")
+def gather_player_windows(final_player_object: dict, windows: context_window.ContextWindows) -> dict[str, list[str]]:
+    player_windows = {}
     for player in final_player_object:
-        player_text = []
-        for sentence_index in final_player_object[player]['mentioned_sentence_indexes']:
-            sentence_with_context = context_window.get_context_window(sentence_index, raw_sentences, window_size=2)
-            player_text.append(sentence_with_context)
-        
+        player_windows[player] = [
+            windows.get(sentence_index) for sentence_index in final_player_object[player]['mentioned_sentence_indexes']
+        ]
+    return player_windows
+
+def score_windows(windows: list[tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE, model=None, pair_cache: PairScoreCache = None) -> np.ndarray:
+    # windows is a flat list of (player, text); returns entailment scores of shape (len(windows), len(candidate_labels)).
+    # model defaults to the registry's NLI model; anything with predict() and config.label2id works (see onnx_backend).
+    # pair_cache defaults to the shared cache for the registry's model, and to a per-call one for an explicit model
+    if len(windows) == 0:
+        return np.empty((0, len(candidate_labels)))
     
-        candidate_labels = ["positive", "negative", "neutral"]
-        
-        def make_hypotheses(player, label):
-            if label == "positive":
-                return f"{player} will perform at a high level or positively influence fantasy points."
-            elif label == "negative":
-                return f"{player} will perform at a low level or negatively impact fantasy points."
-            else:
-                return f"{player} will perform as average or neutrally impact fantasy points."
-            """
-            if label == "positive":
-                return f"{player} will perform at a high level and positively influence fantasy points."
-            elif label == "negative":
-                return f"{player} will underperform or negatively impact fantasy points."
-            else:
-                return f"{player} will have an average or neutral impact."
-            """
+    if model is None:
+        model = registry.get_nli_model()
+        if pair_cache is None:
+            pair_cache = default_pair_score_cache()
+    if pair_cache is None:
+        pair_cache = PairScoreCache()
+    
+    # hypotheses depend only on the player, so they are built once per player rather than once per window
+    player_hypotheses = {}
+    pairs = []
+    for player, text in windows:
+        if player not in player_hypotheses:
+            player_hypotheses[player] = [make_hypotheses(player, label) for label in candidate_labels]
+        pairs.extend((text, hypothesis) for hypothesis in player_hypotheses[player])
+    
+    # repeated windows are scored once, and pairs scored by an earlier call are not scored again
+    pair_scores = pair_cache.get_many(pairs)
+    pending_pairs = [pair for pair in dict.fromkeys(pairs) if pair not in pair_scores]
+    
+    start = time.perf_counter()
+    if len(pending_pairs) > 0:
+        scores = model.predict(pending_pairs, batch_size=batch_size, show_progress_bar=False)
+        entailment_col_index = model.config.label2id['entailment']
+        new_scores = dict(zip(pending_pairs, np.asarray(scores)[:, entailment_col_index].tolist()))
+        pair_cache.put_many(new_scores)
+        pair_scores.update(new_scores)
+    pair_cache.record(len(pairs), len(pending_pairs), time.perf_counter() - start)
+    metrics.count("nli_pairs", len(pairs))
+    metrics.count("nli_pairs_scored", len(pending_pairs))
+    
+    entailment_scores = np.array([pair_scores[pair] for pair in pairs], dtype=np.float32)
+    return entailment_scores.reshape(len(windows), len(candidate_labels))
 
-        results = []
-        for text in player_text:
-            pairs = [(text, make_hypotheses(player, label)) for label in candidate_labels]
-            scores = model.predict(pairs)
-            
-            entailment_col_index = model.config.label2id['entailment']
-            entailment_scores = scores[:, entailment_col_index]
-            best_idx = int(np.argmax(entailment_scores))
-            results.append({
-                "text": text,
-                # "scores": dict(zip(candidate_labels, entailment_scores)),
-                "scores": {label: float(score) for label, score in zip(candidate_labels, entailment_scores)},
-                "best_label": candidate_labels[best_idx]
-            })
-        
-        scores_matrix = np.array([list(result["scores"].values()) for result in results])
-        average_scores = np.mean(scores_matrix, axis=0)
+@stage("aggregation")
+def build_player_sentiment(player_text: list[str], entailment_scores: np.ndarray, occurrence: dict) -> dict:
+    results = []
+    for text, window_scores in zip(player_text, entailment_scores):
+        best_idx = int(np.argmax(window_scores))
+        results.append({
+            "text": text,
+            "scores": {label: float(score) for label, score in zip(candidate_labels, window_scores)},
+            "best_label": candidate_labels[best_idx]
+        })
+    
+    scores_matrix = np.array([list(result["scores"].values()) for result in results])
+    average_scores = np.mean(scores_matrix, axis=0)
+    
+    label_array = [candidate_labels[int(np.argmax(score_set))] for score_set in scores_matrix]
         
-        label_array = [candidate_labels[int(np.argmax(score_set))] for score_set in scores_matrix]
-            
-        most_frequent_label = statistics.mode(label_array)
+    most_frequent_label = statistics.mode(label_array)
+    
+    average_label = candidate_labels[np.argmax(average_scores)]
+    
+    average_scores_dict = {label: float(score) for label, score in zip(candidate_labels, average_scores)}
+    return {
+        "sentiment_consensus": average_scores_dict,
+        "average_label": average_label,
+        "most_frequent_label": most_frequent_label,
+        "detailed_sentiment": results,
+        "status": occurrence['status'],
+        "transcript_name": occurrence['transcript_name'],
+        "player_id": occurrence['player_id'],
+        "player_team": occurrence['player_team'],
+    }
+
+def iter_player_sentiments(final_player_object: dict, windows: context_window.ContextWindows, batch_size: int = DEFAULT_BATCH_SIZE, players: list[str] = None, score=None):
+    # yields (player, sentiment) as soon as each group of players is scored. players are grouped until they fill
+    # SCORING_GROUP_BATCHES full batches, so only the last batch of a group can be partially filled. the first
+    # group only fills one batch, to get the first result out quickly. score defaults to score_windows; the
+    # sentiment engines pass their own scorer with the same signature
+    if score is None:
+        score = score_windows
+    player_windows = gather_player_windows(final_player_object, windows)
+    if players is None:
+        players = list(player_windows.keys())
+    
+    group_pair_target = batch_size
+    group = []
+    group_pairs = 0
+    for i, player in enumerate(players):
+        group.append(player)
+        group_pairs += len(player_windows[player]) * len(candidate_labels)
+        if group_pairs < group_pair_target and i < len(players) - 1:
+            continue
         
-        average_label = candidate_labels[np.argmax(average_scores)]
+        # score every window of the group in one batched pass, then scatter the rows back per player
+        flat_windows = [(group_player, text) for group_player in group for text in player_windows[group_player]]
+        with stage("nli_inference"):
+            entailment_scores = score(flat_windows, batch_size=batch_size)
         
-        average_scores_dict = {label: float(score) for label, score in zip(candidate_labels, average_scores)}
-        sentiment_object[player] = {
-            "sentiment_consensus": average_scores_dict,
-            "average_label": average_label,
-            "most_frequent_label": most_frequent_label,
-            "detailed_sentiment": results,
-            "status": final_player_object[player]['occurrence_array'][0]['status'],
-            "transcript_name": final_player_object[player]['occurrence_array'][0]['transcript_name'],
-            "player_id": final_player_object[player]['occurrence_array'][0]['player_id'],
-            "player_team": final_player_object[player]['occurrence_array'][0]['player_team'],
-        }
+        offset = 0
+        for group_player in group:
+            player_text = player_windows[group_player]
+            player_scores = entailment_scores[offset:offset + len(player_text)]
+            offset += len(player_text)
+            yield group_player, build_player_sentiment(
+                player_text, player_scores, final_player_object[group_player]['occurrence_array'][0]
+            )
+        group = []
+        group_pairs = 0
+        group_pair_target = batch_size * SCORING_GROUP_BATCHES
+
+def analyze_sentiment(final_player_object: dict, windows: context_window.ContextWindows, batch_size: int = DEFAULT_BATCH_SIZE, progress=None):
+    sentiment_object = {}
+    for player, sentiment in iter_player_sentiments(final_player_object, windows, batch_size=batch_size):
+        sentiment_object[player] = sentiment
+        if progress is not None:
+            progress({"players_scored": len(sentiment_object)})
     
-    return sentiment_object
\ No newline at end of file
+    return sentiment_object
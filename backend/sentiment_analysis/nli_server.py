@@ -0,0 +1,182 @@
+# Local NLI inference server: one process holds the NLI model and scores (premise, hypothesis) pairs for every Flask
+# worker on the node, batching pairs across requests (see sentiment_analysis.batching). workers set
+# NLI_SERVER_ADDRESS and get a RemoteCrossEncoder from the registry instead of loading the model themselves. each
+# request carries its caller's lane, so async jobs on every worker yield to interactive requests on every other.
+# run from backend/: python -m sentiment_analysis.nli_server [--address 127.0.0.1:8765] [--backend onnx-int8]
+import argparse
+import ipaddress
+import logging
+import os
+import secrets
+import threading
+from multiprocessing.connection import Client, Listener
+from types import SimpleNamespace
+
+import numpy as np
+
+from sentiment_analysis.batching import (
+    BatchScheduler, current_lane, record_queue_wait, NLI_BATCH_MAX_SIZE, NLI_BATCH_MAX_WAIT_MS, NLI_BACKFILL_MAX_WAIT_MS
+)
+from registry import load_local_nli_model, NLI_SERVER_ADDRESS, NLI_BACKEND, NLI_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+NLI_SERVER_DEFAULT_ADDRESS = "127.0.0.1:8765"
+# messages are pickled, so only processes holding the key may connect. without NLI_SERVER_AUTHKEY the server writes a
+# random key to NLI_SERVER_AUTHKEY_PATH (readable by its user only), and the workers on the node read it from there
+NLI_SERVER_AUTHKEY = os.environ.get("NLI_SERVER_AUTHKEY")
+NLI_SERVER_AUTHKEY_PATH = os.environ.get("NLI_SERVER_AUTHKEY_PATH", "../outputs/nli_server.key")
+
+def parse_address(address: str):
+    # "host:port" for TCP, anything else is a unix socket path
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+def is_loopback(address) -> bool:
+    # unix sockets never leave the node
+    if not isinstance(address, tuple):
+        return True
+    if address[0] == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(address[0]).is_loopback
+    except ValueError:
+        return False
+
+def server_authkey(path: str = NLI_SERVER_AUTHKEY_PATH) -> bytes:
+    if NLI_SERVER_AUTHKEY:
+        return NLI_SERVER_AUTHKEY.encode("utf-8")
+    authkey = secrets.token_hex(32)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    # created 0600 rather than chmod-ed afterwards, so the key is never readable by others
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(authkey)
+    os.replace(temp_path, path)
+    return authkey.encode("utf-8")
+
+def client_authkey(path: str = NLI_SERVER_AUTHKEY_PATH) -> bytes:
+    if NLI_SERVER_AUTHKEY:
+        return NLI_SERVER_AUTHKEY.encode("utf-8")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip().encode("utf-8")
+    except FileNotFoundError:
+        raise RuntimeError(f"NLI_SERVER_AUTHKEY is not set and {path} doesn't exist; start the NLI server on this node first")
+
+def serve_connection(connection, scheduler: BatchScheduler, info: dict):
+    with connection:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                return
+            kind = message.get("kind")
+            try:
+                if kind == "predict":
+                    request = scheduler.submit(message["pairs"], message.get("lane", "interactive"))
+                    connection.send({
+                        "scores": np.array(request.rows, dtype=np.float32),
+                        "queue_wait": request.queue_wait(),
+                        "batches": request.batches,
+                    })
+                elif kind == "info":
+                    connection.send(info)
+                elif kind == "stats":
+                    connection.send(scheduler.stats())
+                else:
+                    connection.send({"error": f"unknown request {kind!r}"})
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                logger.exception("NLI request failed")
+                connection.send({"error": str(e)})
+
+def serve(model, address: str = NLI_SERVER_DEFAULT_ADDRESS, backend: str = None, max_batch_size: int = NLI_BATCH_MAX_SIZE,
+          max_wait_ms: float = NLI_BATCH_MAX_WAIT_MS, backfill_max_wait_ms: float = NLI_BACKFILL_MAX_WAIT_MS,
+          ready: threading.Event = None):
+    # one thread per connected worker thread; all of them feed the same scheduler
+    if not is_loopback(parse_address(address)) and not NLI_SERVER_AUTHKEY:
+        raise ValueError(f"refusing to listen on {address} without NLI_SERVER_AUTHKEY; set one shared with the workers, or bind to loopback")
+    authkey = server_authkey()
+    scheduler = BatchScheduler(model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, backfill_max_wait_ms=backfill_max_wait_ms)
+    info = {"label2id": dict(model.config.label2id), "backend": backend}
+    with Listener(parse_address(address), authkey=authkey) as listener:
+        logger.info("NLI server listening on %s (batches of up to %d pairs, %.1fms/%.1fms max wait for interactive/backfill)",
+                    address, max_batch_size, max_wait_ms, backfill_max_wait_ms)
+        if ready is not None:
+            ready.set()
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                # a client that fails authentication doesn't stop the server
+                logger.warning("rejected NLI client: %s", e)
+                continue
+            threading.Thread(target=serve_connection, args=(connection, scheduler, info), name="nli-client", daemon=True).start()
+
+class RemoteCrossEncoder:
+    # predict()/config stand-in for the CrossEncoder, backed by the NLI server; each thread of each process gets its
+    # own connection, so gunicorn workers forked after the master connected don't share its socket
+    def __init__(self, address: str = NLI_SERVER_ADDRESS):
+        self.address = address
+        self.local = threading.local()
+        self.authkey = client_authkey()
+        info = self._request({"kind": "info"})
+        self.config = SimpleNamespace(label2id=info["label2id"])
+        self.backend = info["backend"]
+
+    def _connection(self):
+        if getattr(self.local, "pid", None) != os.getpid():
+            self.local.connection = Client(parse_address(self.address), authkey=self.authkey)
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def _request(self, message: dict) -> dict:
+        try:
+            connection = self._connection()
+            connection.send(message)
+            response = connection.recv()
+        except (EOFError, OSError):
+            # the server restarted, with a new key unless NLI_SERVER_AUTHKEY is set; reconnect once
+            self.authkey = client_authkey()
+            self.local.pid = None
+            connection = self._connection()
+            connection.send(message)
+            response = connection.recv()
+        if "error" in response:
+            raise RuntimeError(f"NLI server: {response['error']}")
+        return response
+
+    def predict(self, pairs: list[tuple[str, str]], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        # batch_size is the server's business; it batches across every worker's requests
+        response = self._request({"kind": "predict", "pairs": list(pairs), "lane": current_lane.get()})
+        record_queue_wait(response["queue_wait"], response["batches"])
+        if len(pairs) == 0:
+            return np.empty((0, len(self.config.label2id)), dtype=np.float32)
+        return response["scores"]
+
+    def stats(self) -> dict:
+        return self._request({"kind": "stats"})
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the NLI model to every Flask worker on this node.")
+    parser.add_argument("--address", default=NLI_SERVER_ADDRESS or NLI_SERVER_DEFAULT_ADDRESS, help="host:port or a unix socket path; a non-loopback host needs NLI_SERVER_AUTHKEY")
+    parser.add_argument("--backend", choices=NLI_BACKENDS, default=NLI_BACKEND)
+    parser.add_argument("--max-batch-size", type=int, default=NLI_BATCH_MAX_SIZE, help="pairs per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=NLI_BATCH_MAX_WAIT_MS, help="longest an interactive pair waits for its batch to fill")
+    parser.add_argument("--backfill-max-wait-ms", type=float, default=NLI_BACKFILL_MAX_WAIT_MS, help="the same for backfill pairs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    model = load_local_nli_model(args.backend)
+    serve(model, args.address, backend=args.backend, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+          backfill_max_wait_ms=args.backfill_max_wait_ms)
+
+if __name__ == "__main__":
+    main()
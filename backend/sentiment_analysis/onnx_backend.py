@@ -0,0 +1,95 @@
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# the CrossEncoder truncates (context, hypothesis) pairs to the model's max length, so the ONNX path does the same
+ONNX_MAX_LENGTH = 512
+ONNX_OPSET = 17
+EXPORT_SAMPLE = ("Brock Bowers is getting all the targets.", "Brock Bowers will perform at a high level or positively influence fantasy points.")
+
+def onnx_model_path(model_dir: str, quantize: bool) -> str:
+    return os.path.join(model_dir, "model.int8.onnx" if quantize else "model.onnx")
+
+def export_onnx(model_name: str, model_dir: str, quantize: bool = False) -> str:
+    # exports the checkpoint behind the CrossEncoder once (plus its tokenizer and config); later loads reuse the files
+    fp32_path = onnx_model_path(model_dir, quantize=False)
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        logger.info("exporting %s to %s", model_name, fp32_path)
+        os.makedirs(model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+
+        sample = tokenizer([EXPORT_SAMPLE[0]], [EXPORT_SAMPLE[1]], return_tensors="pt")
+        # same positional order as the model's forward()
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET,
+            )
+        tokenizer.save_pretrained(model_dir)
+        model.config.save_pretrained(model_dir)
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = onnx_model_path(model_dir, quantize=True)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # dynamic quantization: int8 weights, activations quantized on the fly, no calibration set needed
+        logger.info("quantizing %s to %s", fp32_path, int8_path)
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+class OnnxCrossEncoder:
+    # the part of the CrossEncoder interface score_windows uses: predict() returning logits, and config.label2id
+    def __init__(self, model_path: str, model_dir: str, intra_op_threads: int = 1):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.config = AutoConfig.from_pretrained(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def predict(self, pairs: list[tuple[str, str]], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        logits = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            features = self.tokenizer(
+                [context for context, _ in batch],
+                [hypothesis for _, hypothesis in batch],
+                padding=True,
+                truncation=True,
+                max_length=ONNX_MAX_LENGTH,
+                return_tensors="np",
+            )
+            inputs = {name: features[name].astype(np.int64) for name in self.input_names}
+            logits.append(self.session.run(["logits"], inputs)[0])
+        if len(logits) == 0:
+            return np.empty((0, len(self.config.label2id)))
+        return np.concatenate(logits)
+
+def load_onnx_model(model_name: str, model_dir: str, quantize: bool = False, intra_op_threads: int = 1) -> OnnxCrossEncoder:
+    model_path = export_onnx(model_name, model_dir, quantize=quantize)
+    return OnnxCrossEncoder(model_path, model_dir, intra_op_threads=intra_op_threads)
@@ -0,0 +1,217 @@
+import os
+import statistics
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+import analyzer
+import sentiment_analysis.nli_deberta_v3_base as nli
+import utils.context_window as context_window
+import utils.coreference as coreference
+from utils.resolution_cache import request_resolution_cache
+
+SESSION_MAX_COUNT = int(os.environ.get("SESSION_MAX_COUNT", 100))
+SESSION_IDLE_SECONDS = int(os.environ.get("SESSION_IDLE_SECONDS", 4 * 60 * 60))
+WINDOW_SIZE = 2
+
+class AnalysisSession:
+    # incremental analysis of a transcript that arrives in chunks. the last sentence is kept "open" because the next
+    # chunk may continue it; each append re-segments only that open sentence plus the new text, and re-scores only the
+    # windows that can see the changed sentences
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.text = ""
+        # sentences before open_sentence_index are settled; the open sentence starts at open_sentence_offset in self.text
+        self.open_sentence_index = 0
+        self.open_sentence_offset = 0
+        self.clean_sentences = []
+        self.final_player_object = {}
+        # recently matched players, so "Kittle" in a later chunk still resolves to the "George Kittle" of an earlier one
+        self.entity_table = coreference.EntityTable()
+        # the latest mention and how far its pronouns are attributed, so a "he" in a later chunk still finds it
+        self.pronoun_context = coreference.PronounContext()
+        # sentence_index -> players mentioned there, so an append only looks at the sentences near the change
+        self.mentions_by_sentence = {}
+        # player -> {sentence_index: window result}, plus running sums so aggregates update in place
+        self.window_results = {}
+        self.score_sums = {}
+        self.label_counts = {}
+        self.appends = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.lock = threading.Lock()
+
+    def append(self, text: str, final: bool = False) -> dict:
+        with self.lock:
+            return self._append(text, final)
+
+    def _append(self, text: str, final: bool) -> dict:
+        start = time.perf_counter()
+        self.text += text
+        self.appends += 1
+        self.updated_at = time.time()
+
+        # segment only the open sentence plus what was just appended
+        identified_names, _, new_clean_sentences, sentence_offsets = analyzer.segment_transcript(self.text[self.open_sentence_offset:])
+        first_changed = self.open_sentence_index
+        for player_object in identified_names:
+            player_object['sentence_index'] += first_changed
+
+        # mentions found in the previously open sentence are replaced by the fresh segmentation
+        self._drop_mentions_from(first_changed)
+        self.pronoun_context.rewind(first_changed)
+        self.clean_sentences[first_changed:] = new_clean_sentences
+
+        new_player_object = analyzer.match_players_to_roster(
+            identified_names, resolution_cache=request_resolution_cache(), windows=context_window.ContextWindows(self.clean_sentences, WINDOW_SIZE),
+            entity_table=self.entity_table, pronoun_context=self.pronoun_context
+        )
+        self._merge_players(new_player_object)
+
+        # windows of mentions up to WINDOW_SIZE sentences before the change can see the changed sentences
+        windows_to_score = []
+        for sentence_index in range(max(0, first_changed - WINDOW_SIZE), len(self.clean_sentences)):
+            for player in self.mentions_by_sentence.get(sentence_index, ()):
+                window_start, window_end = context_window.window_bounds(sentence_index, len(self.clean_sentences), WINDOW_SIZE)
+                window_text = " ".join(self.clean_sentences[window_start:window_end]).strip()
+                previous = self.window_results.get(player, {}).get(sentence_index)
+                if previous is None or previous['text'] != window_text:
+                    windows_to_score.append((player, sentence_index, window_text))
+
+        entailment_scores = nli.score_windows([(player, window_text) for player, _, window_text in windows_to_score])
+        updated_players = set()
+        for (player, sentence_index, window_text), window_scores in zip(windows_to_score, entailment_scores):
+            self._set_window(player, sentence_index, window_text, window_scores)
+            updated_players.add(player)
+
+        if len(new_clean_sentences) > 0:
+            if final:
+                self.open_sentence_index = len(self.clean_sentences)
+                self.open_sentence_offset = len(self.text)
+            else:
+                self.open_sentence_index = first_changed + len(new_clean_sentences) - 1
+                self.open_sentence_offset += sentence_offsets[-1]
+
+        return {
+            "id": self.id,
+            "sentences": len(self.clean_sentences),
+            "sentences_segmented": len(new_clean_sentences),
+            "windows_scored": len(windows_to_score),
+            "players": len(self.final_player_object),
+            "updated_players": {player: self.player_sentiment(player) for player in updated_players if player in self.window_results},
+            "elapsed_seconds": time.perf_counter() - start,
+        }
+
+    def _drop_mentions_from(self, first_changed: int):
+        for sentence_index in range(first_changed, len(self.clean_sentences)):
+            for player in self.mentions_by_sentence.pop(sentence_index, ()):
+                player_entry = self.final_player_object[player]
+                # occurrences are appended in sentence order, so the dropped ones are at the end
+                while len(player_entry['occurrence_array']) > 0 and player_entry['occurrence_array'][-1]['sentence_index'] >= first_changed:
+                    player_entry['occurrence_array'].pop()
+                player_entry['mentioned_sentence_indexes'].discard(sentence_index)
+                self._remove_window(player, sentence_index)
+                if len(player_entry['occurrence_array']) == 0:
+                    del self.final_player_object[player]
+
+    def _merge_players(self, new_player_object: dict):
+        for player, new_entry in new_player_object.items():
+            if player in self.final_player_object:
+                self.final_player_object[player]['occurrence_array'].extend(new_entry['occurrence_array'])
+                self.final_player_object[player]['mentioned_sentence_indexes'].update(new_entry['mentioned_sentence_indexes'])
+            else:
+                self.final_player_object[player] = new_entry
+            for sentence_index in new_entry['mentioned_sentence_indexes']:
+                self.mentions_by_sentence.setdefault(sentence_index, set()).add(player)
+
+    def _set_window(self, player: str, sentence_index: int, window_text: str, window_scores: np.ndarray):
+        self._remove_window(player, sentence_index)
+        best_label = nli.candidate_labels[int(np.argmax(window_scores))]
+        self.window_results.setdefault(player, {})[sentence_index] = {
+            "text": window_text,
+            "scores": {label: float(score) for label, score in zip(nli.candidate_labels, window_scores)},
+            "best_label": best_label,
+        }
+        self.score_sums[player] = self.score_sums.get(player, np.zeros(len(nli.candidate_labels))) + window_scores
+        self.label_counts.setdefault(player, dict.fromkeys(nli.candidate_labels, 0))[best_label] += 1
+
+    def _remove_window(self, player: str, sentence_index: int):
+        previous = self.window_results.get(player, {}).pop(sentence_index, None)
+        if previous is None:
+            return
+        self.score_sums[player] -= np.array([previous['scores'][label] for label in nli.candidate_labels])
+        self.label_counts[player][previous['best_label']] -= 1
+        if len(self.window_results[player]) == 0:
+            del self.window_results[player]
+            del self.score_sums[player]
+            del self.label_counts[player]
+
+    def player_sentiment(self, player: str) -> dict:
+        player_windows = self.window_results[player]
+        average_scores = self.score_sums[player] / len(player_windows)
+        label_counts = self.label_counts[player]
+        top_count = max(label_counts.values())
+        tied_labels = [label for label, count in label_counts.items() if count == top_count]
+        if len(tied_labels) == 1:
+            most_frequent_label = tied_labels[0]
+        else:
+            # same tie-break as statistics.mode: the label seen first in the player's windows
+            most_frequent_label = statistics.mode(
+                [player_windows[i]['best_label'] for i in sorted(player_windows) if player_windows[i]['best_label'] in tied_labels]
+            )
+
+        occurrence = self.final_player_object[player]['occurrence_array'][0]
+        return {
+            "sentiment_consensus": {label: float(score) for label, score in zip(nli.candidate_labels, average_scores)},
+            "average_label": nli.candidate_labels[int(np.argmax(average_scores))],
+            "most_frequent_label": most_frequent_label,
+            "detailed_sentiment": [player_windows[i] for i in sorted(player_windows)],
+            "status": occurrence['status'],
+            "transcript_name": occurrence['transcript_name'],
+            "player_id": occurrence['player_id'],
+            "player_team": occurrence['player_team'],
+        }
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "id": self.id,
+                "appends": self.appends,
+                "sentences": len(self.clean_sentences),
+                "players": {player: self.player_sentiment(player) for player in self.window_results},
+            }
+
+class SessionStore:
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, idle_seconds: int = SESSION_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self) -> AnalysisSession:
+        session = AnalysisSession(uuid.uuid4().hex)
+        with self.lock:
+            self._evict()
+            self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> AnalysisSession:
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self.sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def _evict(self):
+        now = time.time()
+        for session_id in [i for i, session in self.sessions.items() if now - session.updated_at > self.idle_seconds]:
+            del self.sessions[session_id]
+        while len(self.sessions) >= self.max_sessions:
+            self.sessions.popitem(last=False)
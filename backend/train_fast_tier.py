@@ -0,0 +1,57 @@
+# Distills the full DeBERTa NLI model into the fast tier: a linear model on spaCy word vectors, trained on the
+# full model's labels for every player window of the given transcripts. windows in the bundled evaluation set are
+# left out, so benchmarks.fast_tier_eval measures agreement on windows the fast tier never saw.
+# run from backend/: python train_fast_tier.py ../resources/transcript.txt [more transcripts...]
+import argparse
+import json
+
+import numpy as np
+
+import analyzer
+import sentiment_analysis.fast_tier as fast_tier
+import sentiment_analysis.nli_deberta_v3_base as nli
+import utils.context_window as context_window
+from registry import registry
+
+EVAL_SET_PATH = "../resources/sentiment_eval.json"
+
+def load_eval_set(path: str = EVAL_SET_PATH) -> list[tuple[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [(window["player"], window["text"]) for window in json.load(f)]
+
+def transcript_windows(filepath: str) -> list[tuple[str, str]]:
+    identified_names, _, clean_sentences = analyzer.process_transcript(podcast_transcript_filepath=filepath)
+    windows = context_window.ContextWindows(clean_sentences)
+    final_player_object = analyzer.match_players_to_roster(identified_names, windows=windows)
+    player_windows = nli.gather_player_windows(final_player_object, windows)
+    return [(player, text) for player, player_text in player_windows.items() for text in player_text]
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the fast sentiment tier on the full model's labels.")
+    parser.add_argument("transcripts", nargs="*", default=["../resources/transcript.txt"])
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH)
+    parser.add_argument("--output", default=fast_tier.FAST_TIER_WEIGHTS_PATH)
+    parser.add_argument("--l2", type=float, default=1e-3)
+    parser.add_argument("--epochs", type=int, default=500)
+    args = parser.parse_args()
+
+    eval_windows = set(load_eval_set(args.eval_set))
+    windows = []
+    for filepath in args.transcripts:
+        windows.extend(window for window in transcript_windows(filepath) if window not in eval_windows)
+    windows = list(dict.fromkeys(windows))
+    print(f"{len(windows)} training windows from {len(args.transcripts)} transcripts ({len(eval_windows)} held out)")
+
+    label_indexes = np.argmax(nli.score_windows(windows), axis=1)
+    print("full model labels:", {label: int(np.sum(label_indexes == i)) for i, label in enumerate(nli.candidate_labels)})
+
+    features = fast_tier.window_features(windows, registry.get_nlp())
+    model = fast_tier.train(features, label_indexes, nli.candidate_labels, l2=args.l2, epochs=args.epochs)
+    model.save(args.output)
+
+    train_agreement = float(np.mean(np.argmax(model.predict_proba(features), axis=1) == label_indexes))
+    print(f"saved {args.output}, training agreement with the full model {train_agreement:.1%}")
+    print("measure held-out agreement and escalation with: python -m benchmarks.fast_tier_eval")
+
+if __name__ == "__main__":
+    main()
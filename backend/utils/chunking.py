@@ -0,0 +1,22 @@
+import re
+
+# chunks are only cut at paragraph breaks: the parser sets sentence boundaries from the surrounding words, so a cut
+# inside a paragraph could move them. a paragraph longer than max_chars stays one chunk
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+def split_into_chunks(raw_transcript: str, max_chars: int = 10000) -> list[tuple[int, str]]:
+    # returns (char offset, chunk text) pairs; chunks are exact slices of raw_transcript, so offsets stay valid
+    chunks = []
+    chunk_start = 0
+    last_break = 0
+    for match in PARAGRAPH_BREAK.finditer(raw_transcript):
+        position = match.end()
+        # cut at the previous break when the chunk would grow past max_chars
+        if position - chunk_start > max_chars and last_break > chunk_start:
+            chunks.append((chunk_start, raw_transcript[chunk_start:last_break]))
+            chunk_start = last_break
+        last_break = position
+
+    if chunk_start < len(raw_transcript):
+        chunks.append((chunk_start, raw_transcript[chunk_start:]))
+    return chunks
@@ -1,23 +1,31 @@
 import utils.name_cleaning as name_cleaning
 
+def clean_sentences(raw_sentences: list) -> list[str]:
+    # strip and nickname-clean every sentence exactly once; windows are built from this array
+    return [name_cleaning.replace_nickname_in_sentence(sent.text.strip()) for sent in raw_sentences]
+
+def window_bounds(sentence_index: int, sentence_count: int, window_size: int = 2) -> tuple[int, int]:
+    # window_size sentences before and after the mentioned sentence, clipped to the transcript
+    return max(0, sentence_index - window_size), min(sentence_count, sentence_index + window_size + 1)
+
+class ContextWindows:
+    def __init__(self, clean_sentences: list[str], window_size: int = 2):
+        self.clean_sentences = clean_sentences
+        self.window_size = window_size
+        # players mentioned in the same sentence share a window, so each (start, end) slice is joined once
+        self.windows = {}
+
+    def __len__(self) -> int:
+        return len(self.clean_sentences)
+
+    def get(self, sentence_index: int) -> str:
+        bounds = window_bounds(sentence_index, len(self.clean_sentences), self.window_size)
+        context = self.windows.get(bounds)
+        if context is None:
+            context = " ".join(self.clean_sentences[bounds[0]:bounds[1]]).strip()
+            self.windows[bounds] = context
+        return context
+
 def get_context_window(sentence_index: int, sentences: list[str], window_size: int = 2) -> str:
-    preceding_context = []
-    if sentence_index < window_size:
-        preceding_context = sentences[:sentence_index]
-    else:
-        preceding_context = sentences[sentence_index-window_size:sentence_index]
-    
-    following_context = []
-    if sentence_index + window_size >= len(sentences):
-        following_context = sentences[sentence_index:]
-    else:
-        following_context = sentences[sentence_index:sentence_index+window_size+1]
-        
-    context_window = preceding_context + following_context
-    
-    full_context = ""
-    for sent in context_window:
-        clean_sentence = name_cleaning.replace_nickname_in_sentence(sent.text.strip())
-        full_context += clean_sentence + " "
-    
-    return full_context.strip()
\ No newline at end of file
+    start, end = window_bounds(sentence_index, len(sentences), window_size)
+    return " ".join(clean_sentences(sentences[start:end])).strip()
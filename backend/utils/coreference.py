@@ -0,0 +1,89 @@
+import os
+import re
+from collections import OrderedDict
+
+from utils.roster_index import normalize_name
+
+# players remembered for surname/first-name mentions; older ones drop out as the transcript moves on
+ENTITY_TABLE_SIZE = int(os.environ.get("ENTITY_TABLE_SIZE", 20))
+# attribute "he"/"him"/"his" sentences to the player mentioned just before them
+COREFERENCE_PRONOUNS = os.environ.get("COREFERENCE_PRONOUNS", "1") != "0"
+# how many sentences after a mention a pronoun can still refer back to it (the context window size)
+PRONOUN_MAX_DISTANCE = int(os.environ.get("PRONOUN_MAX_DISTANCE", 2))
+
+PRONOUN_PATTERN = re.compile(r"\b(he|him|his)\b", re.IGNORECASE)
+# name tokens that don't identify a player on their own
+NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv", "v"}
+
+def name_keys(player: str) -> set[str]:
+    # the first and last name a player can be mentioned by, e.g. "brock" and "bowers"
+    tokens = [token for token in normalize_name(player).split() if len(token) > 1 and token not in NAME_SUFFIXES]
+    if len(tokens) < 2:
+        return set()
+    return {tokens[0], tokens[-1]}
+
+class EntityTable:
+    # recently resolved players, looked up by a one-word mention in O(1); a word shared by several remembered
+    # players (two Allens) is ambiguous and left to the roster index
+    def __init__(self, max_players: int = ENTITY_TABLE_SIZE):
+        self.max_players = max_players
+        self.players = OrderedDict()
+        self.players_by_key = {}
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def remember(self, player: str):
+        if player in self.players:
+            self.players.move_to_end(player)
+            return
+        keys = name_keys(player)
+        if len(keys) == 0:
+            return
+        self.players[player] = keys
+        for key in keys:
+            self.players_by_key.setdefault(key, set()).add(player)
+        if len(self.players) > self.max_players:
+            self.forget(next(iter(self.players)))
+
+    def forget(self, player: str):
+        for key in self.players.pop(player, ()):
+            players = self.players_by_key[key]
+            players.discard(player)
+            if len(players) == 0:
+                del self.players_by_key[key]
+
+    def lookup(self, mention: str) -> str | None:
+        tokens = normalize_name(mention).split()
+        if len(tokens) != 1:
+            return None
+        players = self.players_by_key.get(tokens[0])
+        if players is None or len(players) != 1:
+            return None
+        return next(iter(players))
+
+def mentions_pronoun(sentence: str) -> str | None:
+    match = PRONOUN_PATTERN.search(sentence)
+    return match.group(0) if match else None
+
+class PronounContext:
+    # the latest sentence that named players (player -> match status) and how far pronouns after it have been
+    # attributed. a session keeps one across appends, so a "he" in a later chunk still finds its antecedent
+    def __init__(self):
+        self.sentence_index = None
+        self.players = {}
+        self.attributed_until = 0
+        # the mention sentence before the latest one, to step back to when the latest is segmented again
+        self.previous = (None, {})
+
+    def start_sentence(self, sentence_index: int):
+        self.previous = (self.sentence_index, self.players)
+        self.sentence_index = sentence_index
+        self.players = {}
+
+    def rewind(self, first_changed: int):
+        # sentences from first_changed on are segmented again, and their mentions and pronouns matched again
+        if self.sentence_index is not None and self.sentence_index >= first_changed:
+            self.sentence_index, self.players = self.previous
+            self.previous = (None, {})
+        self.attributed_until = min(self.attributed_until, first_changed)
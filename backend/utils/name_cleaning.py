@@ -57,6 +57,9 @@ nickname_mappings = {
         
     }
 
+import hashlib
+import json
+import os
 import re
 
 def name_is_valid(name: str) -> bool:
@@ -73,17 +76,81 @@ def name_is_valid(name: str) -> bool:
     
     return not name.lower() in unwanted_names
 
+WORD_BOUNDARY = re.compile(r"\b")
+
+class NicknameMatcher:
+    # character trie over the lowercase nicknames; a sentence is scanned once, trying matches only at word
+    # boundaries, so lookup cost depends on the sentence length and not on how many nicknames are loaded
+    def __init__(self, mappings: dict):
+        # content hash, so cached analysis results can tell when the nickname dictionary changed
+        self.version = hashlib.sha1(json.dumps(mappings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        self.root = {}
+        for nickname, full_name in mappings.items():
+            node = self.root
+            for char in nickname.lower():
+                node = node.setdefault(char, {})
+            node[None] = full_name
+
+    def replace(self, sentence: str) -> str:
+        lowered = sentence.lower()
+        if len(lowered) != len(sentence):
+            # a few unicode characters change length when lowercased; keep offsets aligned with the original
+            lowered = "".join(char.lower() if len(char.lower()) == 1 else char for char in sentence)
+
+        boundaries = [match.start() for match in WORD_BOUNDARY.finditer(sentence)]
+        boundary_set = set(boundaries)
+
+        pieces = []
+        last_end = 0
+        for start in boundaries:
+            if start < last_end or start >= len(sentence) or lowered[start] not in self.root:
+                continue
+
+            # longest nickname starting here that also ends on a word boundary
+            node = self.root
+            match_end = -1
+            replacement = None
+            position = start
+            while position < len(lowered) and lowered[position] in node:
+                node = node[lowered[position]]
+                position += 1
+                if None in node and position in boundary_set:
+                    match_end = position
+                    replacement = node[None]
+
+            if match_end != -1:
+                pieces.append(sentence[last_end:start])
+                pieces.append(replacement)
+                last_end = match_end
+
+        if last_end == 0:
+            return sentence
+        pieces.append(sentence[last_end:])
+        return "".join(pieces)
+
+nickname_matcher = NicknameMatcher(nickname_mappings)
+
+def rebuild_nickname_matcher():
+    global nickname_matcher
+    nickname_matcher = NicknameMatcher(nickname_mappings)
+
+def update_nickname_mappings(new_mappings: dict):
+    nickname_mappings.update({nickname.lower(): full_name for nickname, full_name in new_mappings.items()})
+    rebuild_nickname_matcher()
+
+def load_nickname_mappings(filepath: str):
+    # user-supplied {"asr misspelling": "Full Name"} dictionary, merged on top of the built-in mappings
+    with open(filepath, "r", encoding="utf-8") as f:
+        update_nickname_mappings(json.load(f))
+
 def replace_nickname_in_sentence(sentence: str) -> str:
-    def replacer(match):
-        word = match.group(0)
-        replacement = nickname_mappings.get(word.lower())
-        return replacement
-    
-    pattern = r"\b(" + "|".join(map(re.escape, nickname_mappings.keys())) + r")\b"
-    return re.sub(pattern, replacer, sentence, flags=re.IGNORECASE)
+    return nickname_matcher.replace(sentence)
 
 def replace_nickname_in_name(name: str) -> str:
     if name.lower() in nickname_mappings:
         return nickname_mappings[name.lower()]
         
-    return name    
\ No newline at end of file
+    return name
+
+if os.environ.get("NICKNAME_MAPPINGS_FILE"):
+    load_nickname_mappings(os.environ["NICKNAME_MAPPINGS_FILE"])
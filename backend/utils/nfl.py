@@ -1,34 +1,18 @@
-import requests
-import json
+import logging
 
+import utils.roster_store as roster_store
 
-def get_nfl_players():
-    url = "https://partners.api.espn.com/v2/sports/football/nfl/athletes?limit=99999"
-
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        athletes_array = data['athletes']
-        
-        output_array = []
-        for athlete in athletes_array:
-            athlete_object = {
-                'name': athlete['displayName'],
-                'team': athlete['team']['displayName']
-            }            
-            output_array.append(athlete_object['name'])
-        
-        with open("../resources/nfl_roster.json", "w", encoding="utf-8") as f:
-            json.dump(output_array, f, ensure_ascii=False, indent=2)
+logger = logging.getLogger(__name__)
 
-        return output_array
-    except requests.RequestException as e:
-        return {'error': str(e)}, 500
+def get_nfl_players():
+    # same refresh as the /nfl/athletes route: merge ESPN's athletes (or ROSTER_PAYLOAD_PATH) into the roster store
+    store, delta = roster_store.refresh_roster_store(roster_store.fetch_athletes_payload())
+    logger.info("roster %s (revision %s): %s", store.version, store.revision, roster_store.delta_summary(delta))
+    return store.to_dict()
     
 def main():
+    logging.basicConfig(level=logging.INFO)
     get_nfl_players()
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
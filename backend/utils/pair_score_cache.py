@@ -0,0 +1,78 @@
+import os
+import threading
+from collections import OrderedDict
+
+# bound for the cache shared across requests; a (premise, hypothesis) entry is about one context window of text
+SHARED_CACHE_MAX_ENTRIES = int(os.environ.get("NLI_PAIR_CACHE_MAX_ENTRIES", 30000))
+SHARED_CACHE_ENABLED = os.environ.get("NLI_PAIR_CACHE_SHARED", "1") != "0"
+
+class PairScoreCache:
+    # maps a (premise, hypothesis) pair to its entailment score, and counts how much scoring dedup and reuse saved
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.evictions = 0
+        self.pairs_requested = 0
+        self.pairs_scored = 0
+        self.scoring_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_many(self, pairs: list[tuple[str, str]]) -> dict:
+        found = {}
+        with self.lock:
+            for pair in pairs:
+                score = self.entries.get(pair)
+                if score is not None:
+                    self.entries.move_to_end(pair)
+                    found[pair] = score
+            self.hits += len(found)
+            return found
+
+    def put_many(self, scores: dict):
+        with self.lock:
+            for pair, score in scores.items():
+                self.entries[pair] = score
+                self.entries.move_to_end(pair)
+            while self.max_entries is not None and len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def record(self, pairs_requested: int, pairs_scored: int, seconds: float):
+        with self.lock:
+            self.pairs_requested += pairs_requested
+            self.pairs_scored += pairs_scored
+            self.scoring_seconds += seconds
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            pairs_skipped = self.pairs_requested - self.pairs_scored
+            seconds_per_pair = self.scoring_seconds / self.pairs_scored if self.pairs_scored > 0 else 0.0
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "pairs_requested": self.pairs_requested,
+                "pairs_scored": self.pairs_scored,
+                # share of requested pairs that never reached the model, from in-batch dedup or earlier calls
+                "dedup_ratio": pairs_skipped / self.pairs_requested if self.pairs_requested > 0 else 0.0,
+                "scoring_seconds": self.scoring_seconds,
+                # estimated at the measured cost of the pairs that were scored
+                "seconds_saved": pairs_skipped * seconds_per_pair,
+            }
+
+shared_pair_score_cache = PairScoreCache(max_entries=SHARED_CACHE_MAX_ENTRIES)
+
+def default_pair_score_cache() -> PairScoreCache:
+    # the cache the registry's NLI model scores through: the shared LRU, or a fresh one scoped to the call
+    if SHARED_CACHE_ENABLED:
+        return shared_pair_score_cache
+    return PairScoreCache()
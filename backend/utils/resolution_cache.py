@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import OrderedDict
+
+from utils.roster_index import normalize_name
+
+# bound for the cache shared across requests; per-request caches are unbounded
+SHARED_CACHE_MAX_ENTRIES = int(os.environ.get("RESOLUTION_CACHE_MAX_ENTRIES", 5000))
+SHARED_CACHE_ENABLED = os.environ.get("RESOLUTION_CACHE_SHARED", "1") != "0"
+
+class ResolutionCache:
+    # maps a normalized transcript name (plus the teams mentioned around it, which can change the pick) to its
+    # (possible_matches, status) roster resolution
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.roster_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def bind_roster(self, roster_version: str):
+        # resolutions are only valid for the roster they were computed against
+        with self.lock:
+            if self.roster_version != roster_version:
+                self.entries.clear()
+                self.roster_version = roster_version
+
+    def key(self, transcript_name: str, mentioned_teams: frozenset[str] = frozenset()):
+        if len(mentioned_teams) == 0:
+            return normalize_name(transcript_name)
+        return (normalize_name(transcript_name), mentioned_teams)
+
+    def get(self, transcript_name: str, mentioned_teams: frozenset[str] = frozenset()):
+        key = self.key(transcript_name, mentioned_teams)
+        with self.lock:
+            resolution = self.entries.get(key)
+            if resolution is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return resolution
+
+    def put(self, transcript_name: str, resolution: tuple[list[tuple[str, int]], str], mentioned_teams: frozenset[str] = frozenset()):
+        key = self.key(transcript_name, mentioned_teams)
+        with self.lock:
+            self.entries[key] = resolution
+            self.entries.move_to_end(key)
+            if self.max_entries is not None and len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.roster_version = None
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+                "roster_version": self.roster_version,
+            }
+
+shared_resolution_cache = ResolutionCache(max_entries=SHARED_CACHE_MAX_ENTRIES)
+
+def request_resolution_cache() -> ResolutionCache:
+    # the cache an analysis request should use: the shared LRU, or a fresh one scoped to the request
+    if SHARED_CACHE_ENABLED:
+        return shared_resolution_cache
+    return ResolutionCache()
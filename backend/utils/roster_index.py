@@ -0,0 +1,162 @@
+import os
+import re
+from collections import defaultdict
+
+from fuzzywuzzy import fuzz
+from fuzzywuzzy import process
+from fuzzywuzzy import utils as fuzz_utils
+
+# a roster name needs to share at least this fraction of the query's trigrams to be fuzzy scored
+MIN_TRIGRAM_OVERLAP = 0.3
+
+# only players at these positions are match candidates ("all" keeps every position); PK is ESPN's kicker abbreviation.
+# players without a recorded position are always kept
+ROSTER_MATCH_POSITIONS = os.environ.get("ROSTER_MATCH_POSITIONS", "QB,RB,WR,TE,K,PK")
+# points added toward the > 80 match cut-off for a candidate whose team is mentioned in the mention's context window
+TEAM_MENTION_BOOST = int(os.environ.get("TEAM_MENTION_BOOST", 10))
+
+def match_positions(setting: str = ROSTER_MATCH_POSITIONS) -> frozenset[str] | None:
+    # None means no position filter
+    if setting.strip().lower() in ("", "all"):
+        return None
+    return frozenset(position.strip().upper() for position in setting.split(",") if position.strip())
+
+MATCH_POSITIONS = match_positions()
+
+def team_aliases(teams: set[str]) -> dict[str, str]:
+    # how a team is said in a transcript -> its roster team name: the full name, the nickname ("Chiefs") and the
+    # city ("Kansas City") unless the city has more than one team
+    aliases = {}
+    city_teams = defaultdict(set)
+    for team in teams:
+        aliases[team] = team
+        words = team.split()
+        if len(words) < 2:
+            continue
+        aliases[words[-1]] = team
+        city_teams[" ".join(words[:-1])].add(team)
+    for city, city_team_set in city_teams.items():
+        if len(city_team_set) == 1:
+            aliases[city] = next(iter(city_team_set))
+    return aliases
+
+def normalize_name(name: str) -> str:
+    # same normalization fuzzywuzzy applies before token_set_ratio, so index keys line up with scorer input
+    return fuzz_utils.full_process(name, force_ascii=True)
+
+def name_trigrams(normalized_name: str) -> set[str]:
+    trigrams = set()
+    for token in normalized_name.split():
+        padded = f"  {token} "
+        for i in range(len(padded) - 2):
+            trigrams.add(padded[i:i+3])
+    return trigrams
+
+class RosterIndex:
+    def __init__(self, nfl_player_roster: dict, version: str = None, normalized_names: list[str] = None, positions: frozenset[str] | None = MATCH_POSITIONS):
+        self.version = version
+        # roster order is kept so ties resolve exactly like process.extract over roster.keys()
+        self.names = list(nfl_player_roster.keys())
+        # the roster store keeps every name's normalize_name() precomputed
+        if normalized_names is None:
+            normalized_names = [normalize_name(name) for name in self.names]
+        entries = list(nfl_player_roster.values())
+        self.teams = {name: entry.get('team') for name, entry in zip(self.names, entries)}
+        self.positions = positions
+        self.candidate_count = 0
+        self.name_tokens = []
+        self.exact = defaultdict(list)
+        self.last_name = defaultdict(list)
+        self.token_postings = defaultdict(list)
+        self.trigram_postings = defaultdict(list)
+
+        for position, (normalized, entry) in enumerate(zip(normalized_names, entries)):
+            # players at positions that aren't matched (defenders, linemen, ...) stay out of every posting list
+            player_position = entry.get('position')
+            if positions is not None and player_position is not None and player_position not in positions:
+                self.name_tokens.append(set())
+                continue
+            tokens = set(normalized.split())
+            self.name_tokens.append(tokens)
+            if not tokens:
+                continue
+
+            self.candidate_count += 1
+
+            self.exact[normalized].append(position)
+            self.last_name[normalized.split()[-1]].append(position)
+            for token in tokens:
+                self.token_postings[token].append(position)
+            for trigram in name_trigrams(normalized):
+                self.trigram_postings[trigram].append(position)
+
+        self.team_aliases = team_aliases({team for team in self.teams.values() if team})
+        # longest alias first, so "Kansas City Chiefs" is one mention rather than a city and a nickname; case-sensitive,
+        # so "bills" or "giants" in passing don't count
+        self.team_pattern = re.compile(
+            r"\b(" + "|".join(re.escape(alias) for alias in sorted(self.team_aliases, key=len, reverse=True)) + r")\b"
+        ) if self.team_aliases else None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def mentioned_teams(self, text: str) -> frozenset[str]:
+        # roster teams named in text
+        if self.team_pattern is None:
+            return frozenset()
+        return frozenset(self.team_aliases[match.group(0)] for match in self.team_pattern.finditer(text))
+
+    def team_of(self, name: str) -> str:
+        return self.teams.get(name)
+
+    def lookup_exact(self, player: str) -> list[str]:
+        return [self.names[position] for position in self.exact.get(normalize_name(player), [])]
+
+    def lookup_last_name(self, last_name: str) -> list[str]:
+        return [self.names[position] for position in self.last_name.get(normalize_name(last_name), [])]
+
+    def _containment_candidates(self, tokens: set[str]) -> list[int]:
+        # roster names whose token set contains, or is contained in, the query tokens score 100 with token_set_ratio
+        shared_counts = defaultdict(int)
+        for token in tokens:
+            for position in self.token_postings.get(token, []):
+                shared_counts[position] += 1
+
+        return [
+            position for position, shared in shared_counts.items()
+            if shared == len(tokens) or shared == len(self.name_tokens[position])
+        ]
+
+    def _fuzzy_candidates(self, normalized: str, tokens: set[str]) -> list[int]:
+        candidates = set()
+        for token in tokens:
+            candidates.update(self.token_postings.get(token, []))
+
+        trigrams = name_trigrams(normalized)
+        shared_counts = defaultdict(int)
+        for trigram in trigrams:
+            for position in self.trigram_postings.get(trigram, []):
+                shared_counts[position] += 1
+
+        min_shared = max(1, int(len(trigrams) * MIN_TRIGRAM_OVERLAP))
+        candidates.update(position for position, shared in shared_counts.items() if shared >= min_shared)
+        return list(candidates)
+
+    def candidates(self, player: str) -> list[str]:
+        normalized = normalize_name(player)
+        tokens = set(normalized.split())
+        if not tokens:
+            return []
+
+        positions = self._containment_candidates(tokens)
+        if len(positions) == 0 and normalized not in self.exact:
+            positions = self._fuzzy_candidates(normalized, tokens)
+
+        return [self.names[position] for position in sorted(positions)]
+
+    def extract(self, player: str, limit: int | None = 5) -> list[tuple[str, int]]:
+        # drop-in for process.extract(player, roster.keys(), limit=limit, scorer=fuzz.token_set_ratio)
+        candidate_names = self.candidates(player)
+        if len(candidate_names) == 0:
+            return []
+        return process.extract(player, candidate_names, limit=limit, scorer=fuzz.token_set_ratio)
@@ -0,0 +1,360 @@
+# Compact on-disk roster: one record per player in the single roster schema (name -> id, team, position), team and
+# position strings interned into small tables, every name's normalize_name() precomputed, and a name-sorted and a
+# normalized-name-sorted permutation for binary search. the file is read through mmap, so opening it costs a header
+# read and lookups only touch the pages they need.
+# refreshed with a delta (adds, team/id/position changes, removals) merged over the current store.
+# run from backend/: python -m utils.roster_store [--payload ../resources/espn_athletes_fixture.json] [--store path]
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from collections.abc import Mapping
+
+from utils.roster_index import normalize_name, RosterIndex
+
+ROSTER_STORE_PATH = os.environ.get("ROSTER_STORE_PATH", "../resources/nfl_roster.bin")
+# seed roster the store is built from when ROSTER_STORE_PATH doesn't exist yet
+ROSTER_SEED_PATH = "../resources/nfl_roster.json"
+# recorded athletes payload to refresh from instead of calling ESPN (offline runs and tests)
+ROSTER_PAYLOAD_PATH = os.environ.get("ROSTER_PAYLOAD_PATH")
+ESPN_ATHLETES_URL = "https://partners.api.espn.com/v2/sports/football/nfl/athletes?limit=20000"
+# a refresh removing more than this share of the roster is refused unless forced; a truncated ESPN response or a small
+# recorded payload pointed at the real store would otherwise read as most players being cut
+ROSTER_MAX_REMOVED_FRACTION = float(os.environ.get("ROSTER_MAX_REMOVED_FRACTION", 0.05))
+
+MAGIC = b"FFSR"
+# bump whenever the layout or normalize_name changes; older files are rebuilt from their entries
+FORMAT_VERSION = 1
+# magic, format, revision, players, teams, positions, strings size, fetched_at, content sha1
+HEADER = struct.Struct("<4sHIIHHId20s")
+# name, normalized name, id as (offset, length) into the string blob, then team and position table indexes
+RECORD = struct.Struct("<IHIHIHHH")
+STRING_REF = struct.Struct("<IH")
+PERMUTATION = struct.Struct("<I")
+# team/position index for players without one
+NO_VALUE = 0xFFFF
+
+class RosterFormatError(ValueError):
+    pass
+
+class RosterShrinkError(ValueError):
+    pass
+
+def roster_content_hash(entries: dict) -> bytes:
+    # hash of the entries in roster order, the store's version stamp
+    return hashlib.sha1(json.dumps(list(entries.items()), ensure_ascii=False).encode("utf-8")).digest()
+
+class RosterStore(Mapping):
+    # read-only name -> {"id", "team", "position"} mapping over a memory-mapped roster file
+    def __init__(self, buffer, path: str = None):
+        self.buffer = buffer
+        self.path = path
+        self.entries = {}
+        if len(buffer) < HEADER.size:
+            raise RosterFormatError(f"{path}: too short to be a roster store")
+        magic, format_version, self.revision, self.player_count, team_count, position_count, strings_size, self.fetched_at, content_hash = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise RosterFormatError(f"{path}: not a roster store")
+        if format_version != FORMAT_VERSION:
+            raise RosterFormatError(f"{path}: roster store format {format_version}, expected {FORMAT_VERSION}")
+        self.content_hash = content_hash.hex()
+        self.version = self.content_hash[:12]
+
+        offset = HEADER.size
+        self.teams_offset = offset
+        offset += team_count * STRING_REF.size
+        self.positions_offset = offset
+        offset += position_count * STRING_REF.size
+        self.records_offset = offset
+        offset += self.player_count * RECORD.size
+        self.by_name_offset = offset
+        offset += self.player_count * PERMUTATION.size
+        self.by_normalized_offset = offset
+        offset += self.player_count * PERMUTATION.size
+        self.strings_offset = offset
+        if len(buffer) != offset + strings_size:
+            raise RosterFormatError(f"{path}: truncated roster store")
+
+        # interned tables are tiny, decode them once
+        self.teams = [self._table_string(self.teams_offset, i) for i in range(team_count)]
+        self.positions = [self._table_string(self.positions_offset, i) for i in range(position_count)]
+
+    @classmethod
+    def open(cls, path: str) -> "RosterStore":
+        with open(path, "rb") as f:
+            # the mapping stays valid after the file is closed (or atomically replaced by a refresh)
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path=path)
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self.strings_offset + offset
+        return bytes(self.buffer[start:start + length]).decode("utf-8")
+
+    def _table_string(self, table_offset: int, i: int) -> str:
+        return self._string(*STRING_REF.unpack_from(self.buffer, table_offset + i * STRING_REF.size))
+
+    def _record(self, position: int) -> tuple:
+        return RECORD.unpack_from(self.buffer, self.records_offset + position * RECORD.size)
+
+    def _permuted(self, permutation_offset: int, i: int) -> int:
+        return PERMUTATION.unpack_from(self.buffer, permutation_offset + i * PERMUTATION.size)[0]
+
+    def name(self, position: int) -> str:
+        name_offset, name_length, *_ = self._record(position)
+        return self._string(name_offset, name_length)
+
+    def normalized_name(self, position: int) -> str:
+        _, _, normalized_offset, normalized_length, *_ = self._record(position)
+        return self._string(normalized_offset, normalized_length)
+
+    def entry(self, position: int) -> dict:
+        _, _, _, _, id_offset, id_length, team_index, position_index = self._record(position)
+        return {
+            "id": self._string(id_offset, id_length),
+            "team": self.teams[team_index] if team_index != NO_VALUE else None,
+            "position": self.positions[position_index] if position_index != NO_VALUE else None,
+        }
+
+    def _bisect(self, permutation_offset: int, key, target: str) -> int:
+        # first index in the permutation whose key(position) is >= target
+        low, high = 0, self.player_count
+        while low < high:
+            middle = (low + high) // 2
+            if key(self._permuted(permutation_offset, middle)) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def position_of(self, name: str) -> int:
+        i = self._bisect(self.by_name_offset, self.name, name)
+        if i < self.player_count:
+            position = self._permuted(self.by_name_offset, i)
+            if self.name(position) == name:
+                return position
+        return -1
+
+    def lookup_normalized(self, normalized: str) -> list[int]:
+        # record positions whose precomputed normalize_name() equals normalized, in roster order
+        i = self._bisect(self.by_normalized_offset, self.normalized_name, normalized)
+        positions = []
+        while i < self.player_count:
+            position = self._permuted(self.by_normalized_offset, i)
+            if self.normalized_name(position) != normalized:
+                break
+            positions.append(position)
+            i += 1
+        return sorted(positions)
+
+    def names(self) -> list[str]:
+        return [self.name(position) for position in range(self.player_count)]
+
+    def normalized_names(self) -> list[str]:
+        return [self.normalized_name(position) for position in range(self.player_count)]
+
+    def __getitem__(self, name: str) -> dict:
+        # the same few players are looked up for every mention, so entries are decoded once
+        entry = self.entries.get(name)
+        if entry is None:
+            position = self.position_of(name)
+            if position < 0:
+                raise KeyError(name)
+            entry = self.entries[name] = self.entry(position)
+        return entry
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self.position_of(name) >= 0
+
+    def __iter__(self):
+        # roster order, which the roster index relies on for tie-breaking
+        return (self.name(position) for position in range(self.player_count))
+
+    def __len__(self) -> int:
+        return self.player_count
+
+    def values(self) -> list[dict]:
+        # positional, instead of a binary search per name
+        return [self.entry(position) for position in range(self.player_count)]
+
+    def items(self) -> list[tuple[str, dict]]:
+        return [(self.name(position), self.entry(position)) for position in range(self.player_count)]
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def stamp(self) -> dict:
+        return {
+            "version": self.version,
+            "revision": self.revision,
+            "fetched_at": self.fetched_at,
+            "players": self.player_count,
+            "teams": len(self.teams),
+        }
+
+def pack_roster(entries: dict, revision: int = 1, fetched_at: float = None) -> bytes:
+    strings = bytearray()
+    string_refs = {}
+
+    def intern(value: str) -> tuple[int, int]:
+        if value not in string_refs:
+            encoded = value.encode("utf-8")
+            if len(encoded) > 0xFFFF:
+                raise RosterFormatError(f"roster string too long: {value[:40]!r}...")
+            string_refs[value] = (len(strings), len(encoded))
+            strings.extend(encoded)
+        return string_refs[value]
+
+    teams = sorted({entry.get("team") for entry in entries.values() if entry.get("team")})
+    positions = sorted({entry.get("position") for entry in entries.values() if entry.get("position")})
+    team_indexes = {team: i for i, team in enumerate(teams)}
+    position_indexes = {position: i for i, position in enumerate(positions)}
+
+    names = list(entries.keys())
+    normalized_names = [normalize_name(name) for name in names]
+    records = bytearray()
+    for name, normalized in zip(names, normalized_names):
+        entry = entries[name]
+        records.extend(RECORD.pack(
+            *intern(name),
+            *intern(normalized),
+            *intern(str(entry.get("id") or "")),
+            team_indexes.get(entry.get("team"), NO_VALUE),
+            position_indexes.get(entry.get("position"), NO_VALUE),
+        ))
+
+    tables = b"".join(STRING_REF.pack(*intern(value)) for value in teams + positions)
+    by_name = b"".join(PERMUTATION.pack(i) for i in sorted(range(len(names)), key=lambda i: names[i]))
+    by_normalized = b"".join(PERMUTATION.pack(i) for i in sorted(range(len(names)), key=lambda i: (normalized_names[i], i)))
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, revision, len(names), len(teams), len(positions), len(strings),
+        fetched_at if fetched_at is not None else time.time(), roster_content_hash(entries),
+    )
+    return header + tables + bytes(records) + by_name + by_normalized + bytes(strings)
+
+def write_roster_store(path: str, entries: dict, revision: int = 1, fetched_at: float = None) -> RosterStore:
+    packed = pack_roster(entries, revision=revision, fetched_at=fetched_at)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # readers keep whichever version they have mapped; new opens see the new file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(packed)
+    os.replace(temp_path, path)
+    return RosterStore.open(path)
+
+def load_seed_roster(seed_path: str = ROSTER_SEED_PATH) -> dict:
+    # nfl_roster.json: name -> {"id", "team"[, "position"]}, the older bare list of names, or a recorded athletes payload
+    with open(seed_path, "r", encoding="utf-8") as f:
+        seed = json.load(f)
+    if isinstance(seed, dict) and isinstance(seed.get("athletes"), list):
+        return athletes_from_payload(seed)
+    if isinstance(seed, list):
+        seed = {name: {} for name in seed}
+    return {name: {"id": entry.get("id"), "team": entry.get("team"), "position": entry.get("position")} for name, entry in seed.items()}
+
+def open_roster_store(path: str = ROSTER_STORE_PATH, seed_path: str = ROSTER_SEED_PATH) -> RosterStore:
+    # the store, built from the seed roster the first time (or when it was written by an older format)
+    try:
+        return RosterStore.open(path)
+    except (FileNotFoundError, RosterFormatError):
+        return write_roster_store(path, load_seed_roster(seed_path))
+
+def load_roster(store_path: str = ROSTER_STORE_PATH, seed_path: str = ROSTER_SEED_PATH) -> tuple[RosterStore, RosterIndex]:
+    # the roster store, and the match index built over it once per load
+    store = open_roster_store(store_path, seed_path)
+    return store, RosterIndex(store, version=store.version, normalized_names=store.normalized_names())
+
+def athletes_from_payload(payload: dict) -> dict:
+    # ESPN athletes response -> the roster schema; a repeated display name keeps its last athlete, as before
+    entries = {}
+    for athlete in payload["athletes"]:
+        entries[athlete["displayName"]] = {
+            "id": str(athlete["id"]),
+            "team": (athlete.get("team") or {}).get("displayName"),
+            "position": (athlete.get("position") or {}).get("abbreviation"),
+        }
+    return entries
+
+def fetch_athletes_payload(url: str = ESPN_ATHLETES_URL, payload_path: str = ROSTER_PAYLOAD_PATH) -> dict:
+    if payload_path:
+        with open(payload_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    import requests
+
+    response = requests.get(url)
+    response.raise_for_status()
+    return response.json()
+
+def diff_rosters(current: Mapping, incoming: dict) -> dict:
+    delta = {"added": {}, "removed": [], "team_changed": {}, "updated": {}}
+    for name, entry in incoming.items():
+        if name not in current:
+            delta["added"][name] = entry
+            continue
+        old_entry = current[name]
+        if old_entry == entry:
+            continue
+        if old_entry.get("team") != entry.get("team"):
+            delta["team_changed"][name] = {"from": old_entry.get("team"), "to": entry.get("team")}
+        # id/position changes, and team changes too, so applying "updated" alone brings the entry up to date
+        delta["updated"][name] = entry
+    delta["removed"] = [name for name in current if name not in incoming]
+    return delta
+
+def delta_is_empty(delta: dict) -> bool:
+    return not (delta["added"] or delta["removed"] or delta["updated"])
+
+def apply_delta(current: Mapping, delta: dict) -> dict:
+    # existing players keep their roster position (and so their tie-breaking order); additions go at the end
+    removed = set(delta["removed"])
+    merged = {name: delta["updated"].get(name, current[name]) for name in current if name not in removed}
+    merged.update(delta["added"])
+    return merged
+
+def delta_summary(delta: dict) -> dict:
+    return {
+        "added": len(delta["added"]),
+        "removed": len(delta["removed"]),
+        "team_changed": len(delta["team_changed"]),
+        "updated": len(delta["updated"]),
+    }
+
+def refresh_roster_store(payload: dict, path: str = ROSTER_STORE_PATH, seed_path: str = ROSTER_SEED_PATH, force: bool = False,
+                         max_removed_fraction: float = ROSTER_MAX_REMOVED_FRACTION) -> tuple[RosterStore, dict]:
+    incoming = athletes_from_payload(payload)
+    if len(incoming) == 0:
+        # an empty response would read as every player being removed
+        raise ValueError("athletes payload has no athletes, keeping the current roster")
+
+    current = open_roster_store(path, seed_path)
+    delta = diff_rosters(current, incoming)
+    if not force and len(delta["removed"]) > max_removed_fraction * len(current):
+        raise RosterShrinkError(
+            f"refresh would remove {len(delta['removed'])} of {len(current)} players (more than {max_removed_fraction:.0%}), "
+            "keeping the current roster; force the refresh if the payload is complete"
+        )
+    if delta_is_empty(delta):
+        # same version stamp, so caches keyed on it stay valid
+        return current, delta
+    store = write_roster_store(path, apply_delta(current, delta), revision=current.revision + 1)
+    return store, delta
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the roster store from ESPN or a recorded athletes payload.")
+    parser.add_argument("--payload", default=ROSTER_PAYLOAD_PATH, help="recorded athletes payload instead of calling ESPN")
+    parser.add_argument("--store", default=ROSTER_STORE_PATH)
+    parser.add_argument("--seed", default=ROSTER_SEED_PATH)
+    parser.add_argument("--force", action="store_true", help=f"apply a refresh that removes more than {ROSTER_MAX_REMOVED_FRACTION:.0%} of the roster")
+    args = parser.parse_args()
+
+    store, delta = refresh_roster_store(fetch_athletes_payload(payload_path=args.payload), path=args.store, seed_path=args.seed, force=args.force)
+    print(f"roster {store.version} (revision {store.revision}, {len(store)} players): {delta_summary(delta)}")
+    for name, change in delta["team_changed"].items():
+        print(f"  {name}: {change['from']} -> {change['to']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+from array import array
+from bisect import bisect_right
+
+SPAN_KEYS = ["char_starts", "char_ends", "audio_starts", "audio_ends"]
+SEGMENT_KEYS = ["start", "end", "text"]
+
+class TranscriptFormatError(ValueError):
+    # a client-supplied timed transcript that can't be read
+    pass
+
+class TimedTranscript:
+    # transcript text plus, for each transcribed segment, its character span in the text and its audio span in seconds.
+    # the spans live in parallel arrays instead of a dict per segment, so a long episode stays small and a character
+    # offset maps to its segment with a binary search
+    def __init__(self, text: str, char_starts, char_ends, audio_starts, audio_ends):
+        self.text = text
+        self.char_starts = array("q", char_starts)
+        self.char_ends = array("q", char_ends)
+        self.audio_starts = array("d", audio_starts)
+        self.audio_ends = array("d", audio_ends)
+
+    @classmethod
+    def from_segments(cls, segments: list[dict], separator: str = " ") -> "TimedTranscript":
+        # segments are {"start", "end", "text"} in audio order, as utils.transcript yields them
+        parts = []
+        char_starts, char_ends, audio_starts, audio_ends = [], [], [], []
+        position = 0
+        for segment in segments:
+            if len(parts) > 0:
+                parts.append(separator)
+                position += len(separator)
+            parts.append(segment["text"])
+            char_starts.append(position)
+            position += len(segment["text"])
+            char_ends.append(position)
+            audio_starts.append(segment["start"])
+            audio_ends.append(segment["end"])
+        return cls("".join(parts), char_starts, char_ends, audio_starts, audio_ends)
+
+    def __len__(self) -> int:
+        return len(self.char_starts)
+
+    def segment_at(self, char_offset: int) -> int:
+        # index of the segment containing char_offset; an offset in the separator after a segment belongs to that segment
+        return max(0, bisect_right(self.char_starts, char_offset) - 1)
+
+    def time_span(self, char_start: int, char_end: int) -> tuple[float | None, float | None]:
+        # audio (start, end) in seconds covering the characters [char_start, char_end); (None, None) without segments
+        if len(self) == 0:
+            return None, None
+        first = self.segment_at(char_start)
+        last = self.segment_at(max(char_start, char_end - 1))
+        return self.audio_starts[first], self.audio_ends[last]
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256(self.text.encode("utf-8"))
+        for spans in (self.char_starts, self.char_ends, self.audio_starts, self.audio_ends):
+            digest.update(spans.tobytes())
+        return digest.hexdigest()
+
+    def to_dict(self) -> dict:
+        return {
+            "text": self.text,
+            "char_starts": self.char_starts.tolist(),
+            "char_ends": self.char_ends.tolist(),
+            "audio_starts": self.audio_starts.tolist(),
+            "audio_ends": self.audio_ends.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TimedTranscript":
+        # raises TranscriptFormatError on missing keys, span arrays of different lengths or values of the wrong type
+        if not isinstance(data, dict):
+            raise TranscriptFormatError("timed transcript must be an object")
+        if "segments" in data:
+            segments = data["segments"]
+            if not isinstance(segments, list) or not all(isinstance(segment, dict) for segment in segments):
+                raise TranscriptFormatError("segments must be a list of {start, end, text} objects")
+            for segment in segments:
+                missing = [key for key in SEGMENT_KEYS if key not in segment]
+                if missing:
+                    raise TranscriptFormatError(f"segment is missing {', '.join(missing)}")
+                if not isinstance(segment["text"], str):
+                    raise TranscriptFormatError("segment text must be a string")
+            try:
+                return cls.from_segments(segments)
+            except TypeError as e:
+                raise TranscriptFormatError(f"segment start and end must be numbers: {e}")
+
+        missing = [key for key in ["text"] + SPAN_KEYS if key not in data]
+        if missing:
+            raise TranscriptFormatError(f"timed transcript is missing {', '.join(missing)}")
+        if not isinstance(data["text"], str):
+            raise TranscriptFormatError("text must be a string")
+        if not all(isinstance(data[key], list) for key in SPAN_KEYS):
+            raise TranscriptFormatError(f"{', '.join(SPAN_KEYS)} must be lists")
+        lengths = {key: len(data[key]) for key in SPAN_KEYS}
+        if len(set(lengths.values())) != 1:
+            raise TranscriptFormatError(f"span arrays must have equal lengths, got {lengths}")
+        try:
+            return cls(data["text"], *(data[key] for key in SPAN_KEYS))
+        except TypeError as e:
+            raise TranscriptFormatError(f"span arrays must hold numbers: {e}")
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "TimedTranscript":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
@@ -1,151 +1,198 @@
+import logging
 import os
-from dotenv import dotenv_values
-from openai import OpenAI
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.timed_transcript import TimedTranscript
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_PROMPT = "This is a podcast episode discussing NFL football players for the purpose of Fantasy Football."
+
+# faster-whisper settings shared by every transcription worker
+WHISPER_MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "turbo")
+WHISPER_COMPUTE_TYPE = "int8"
+WHISPER_SAMPLE_RATE = 16000
+TRANSCRIPTION_WORKERS = int(os.environ.get("TRANSCRIPTION_WORKERS", 2))
+
+# chunks are cut at silences and capped at this length; speech longer than that is cut hard with an overlap
+CHUNK_MAX_MS = 2 * 60 * 1000
+CHUNK_OVERLAP_MS = 1000
+
+class AudioChunk:
+    def __init__(self, index: int, start_ms: int, end_ms: int):
+        self.index = index
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        # only segments starting in [keep_from_ms, keep_until_ms) are kept. these differ from start/end only around a
+        # hard cut, where two chunks overlap and the middle of the overlap decides which chunk owns a segment
+        self.keep_from_ms = start_ms
+        self.keep_until_ms = end_ms
+
+def chunk_audio_by_silence(audio, max_duration_ms: int = CHUNK_MAX_MS, min_silence_len: int = 700, silence_thresh: int = -40, keep_silence: int = 500) -> list[AudioChunk]:
+    from pydub import silence
+
+    logger.info("Finding chunks by silence")
+    # nonsilent ranges keep their position in the file, unlike split_on_silence, so timestamps can be restored
+    speech_ranges = silence.detect_nonsilent(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
+    return group_speech_ranges(speech_ranges, len(audio), max_duration_ms, keep_silence)
+
+def group_speech_ranges(speech_ranges: list, audio_ms: int, max_duration_ms: int = CHUNK_MAX_MS, keep_silence: int = 500) -> list[AudioChunk]:
+    logger.info("Grouping chunks")
+    chunks = []
+
+    def add_chunk(start_ms, end_ms):
+        chunk = AudioChunk(len(chunks), start_ms, end_ms)
+        if chunks and chunks[-1].end_ms > start_ms:
+            overlap_middle = (start_ms + chunks[-1].end_ms) // 2
+            chunks[-1].keep_until_ms = overlap_middle
+            chunk.keep_from_ms = overlap_middle
+        chunks.append(chunk)
+
+    group_start = None
+    group_end = None
+    for speech_start, speech_end in speech_ranges:
+        speech_start = max(0, speech_start - keep_silence)
+        speech_end = min(audio_ms, speech_end + keep_silence)
+        if group_start is None:
+            group_start = speech_start
+        elif speech_end - group_start > max_duration_ms:
+            add_chunk(group_start, group_end)
+            group_start = max(speech_start, group_end)
+        group_end = max(group_end or 0, speech_end)
+
+        # a single stretch of speech longer than the cap is cut hard, with an overlap so no words are lost at the cut
+        while group_end - group_start > max_duration_ms:
+            cut = group_start + max_duration_ms
+            add_chunk(group_start, cut)
+            group_start = cut - CHUNK_OVERLAP_MS
+
+    if group_start is not None and group_end > group_start:
+        add_chunk(group_start, group_end)
+    if len(chunks) == 0 and audio_ms > 0:
+        add_chunk(0, audio_ms)
+    return chunks
+
+def chunk_samples(audio, chunk: AudioChunk):
+    import numpy as np
+
+    # 16 kHz mono float32 in [-1, 1], the raw input faster-whisper accepts
+    segment = audio[chunk.start_ms:chunk.end_ms].set_frame_rate(WHISPER_SAMPLE_RATE).set_channels(1).set_sample_width(2)
+    return np.array(segment.get_array_of_samples(), dtype=np.float32) / 32768.0
+
+whisper_model = None
+
+def init_transcription_worker(cpu_threads: int):
+    # one CPU int8 WhisperModel per worker process, loaded once and reused for every chunk it gets
+    global whisper_model
+    from faster_whisper import WhisperModel
+
+    whisper_model = WhisperModel(WHISPER_MODEL_SIZE, device="cpu", compute_type=WHISPER_COMPUTE_TYPE, cpu_threads=cpu_threads)
+
+def transcribe_chunk(chunk: AudioChunk, samples) -> list[dict]:
+    segments, _ = whisper_model.transcribe(
+        samples,
+        beam_size=5,
+        task="transcribe",
+        language="en",
+        initial_prompt=TRANSCRIPTION_PROMPT,
+        vad_filter=True,
+        word_timestamps=False
+    )
+
+    offset = chunk.start_ms / 1000
+    results = []
+    for segment in segments:
+        start = segment.start + offset
+        if not chunk.keep_from_ms <= start * 1000 < chunk.keep_until_ms:
+            continue
+        text = segment.text.strip()
+        if text:
+            results.append({"start": start, "end": segment.end + offset, "text": text})
+    return results
+
+def iter_transcribed_segments(filename: str, workers: int = TRANSCRIPTION_WORKERS, max_chunk_ms: int = CHUNK_MAX_MS):
+    # yields {"start", "end", "text"} segments in audio order (seconds from the start of the file), chunk by chunk,
+    # while later chunks are still being transcribed by the other workers
+    from pydub import AudioSegment
+
+    logger.info("Loading audio file")
+    audio = AudioSegment.from_file(filename)
+    chunks = chunk_audio_by_silence(audio, max_duration_ms=max_chunk_ms)
+    logger.info("Transcribing %d chunks on %d workers", len(chunks), workers)
+
+    cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_transcription_worker, initargs=(cpu_threads,)) as executor:
+        # executor.map would build and pickle every chunk's samples up front, so only 2 * workers chunks are in flight
+        # and each chunk's samples are built just before it is submitted
+        in_flight = deque()
+        next_chunk = 0
+        while next_chunk < len(chunks) or in_flight:
+            while next_chunk < len(chunks) and len(in_flight) < 2 * workers:
+                chunk = chunks[next_chunk]
+                in_flight.append((chunk, executor.submit(transcribe_chunk, chunk, chunk_samples(audio, chunk))))
+                next_chunk += 1
+            # oldest first, so segments come out in audio order
+            chunk, future = in_flight.popleft()
+            segments = future.result()
+            logger.info("Transcribed chunk %d of %d", chunk.index + 1, len(chunks))
+            yield from segments
+
+def transcribe_audio(filename: str, workers: int = TRANSCRIPTION_WORKERS) -> TimedTranscript:
+    return TimedTranscript.from_segments(list(iter_transcribed_segments(filename, workers=workers)))
+
+def transcribe_chunks_with_openai(file_path: str, directory: str = "../outputs/audio_chunks"):
+    from dotenv import dotenv_values
+    from openai import OpenAI
+    from pydub import AudioSegment
 
-def chunk_audio_by_silence(file_path, max_duration_ms = 20 * 50 * 1000):
-    from pydub import AudioSegment, silence
-    
-    print("Loading audio file")
     audio = AudioSegment.from_file(file_path)
-    chunks = silence.split_on_silence(
-        audio,
-        min_silence_len=700,
-        silence_thresh=-40,
-        keep_silence=500
-    )
-    print("Found chunks by silence")
-    
-    print("Grouping chunks")
-    grouped = []
-    current_group = AudioSegment.from_file(file_path)
-    
-    for c in chunks:
-        if len(current_group) + len(c) > max_duration_ms:
-            grouped.append(current_group)
-            current_group = AudioSegment.silent(duration=0)
-        current_group += c
-
-    if len(current_group) > 0:
-        grouped.append(current_group)
-        
-    for i, g in enumerate(grouped):
-        print("Exporting chunk", i+1, "of", len(grouped))
-        g.export(f"../outputs/audio_chunks/chunk_{i+1}.mp3", format="mp3")
-    
-
-file_path = "../resources/te_podcast_mp3.mp3"
-
-print("Chunking audio by silence...")
-
-audio_chunks = chunk_audio_by_silence(file_path)
-print("Finished chunking audio by silence.")
-
-env_values = dotenv_values(".env")  # load .env file
-open_api_key = env_values["OPEN_AI_API_KEY"]  # access variables like a dictionary
-print("Loaded OPEN_AI_API_KEY from .env file:", bool(open_api_key))
-
-client = OpenAI(api_key=open_api_key)
-
-directory = "../outputs/audio_chunks"
-for found_file in os.listdir(directory):
-    file_name = os.fsdecode(found_file)
-    if file_name.endswith(".mp3"):
-        print("Transcribing chunk:", file_name)
-        audio_file= open(os.path.join(directory, file_name), "rb")
-        
-        transcription = client.audio.transcriptions.create(
-            model="gpt-4o-transcribe", 
-            file=audio_file,
-            prompt="This is a podcast episode discussing NFL football players for the purpose of Fantasy Football.",
-        )
+    chunks = chunk_audio_by_silence(audio, max_duration_ms=20 * 50 * 1000)
+    for chunk in chunks:
+        logger.info("Exporting chunk %d of %d", chunk.index + 1, len(chunks))
+        audio[chunk.start_ms:chunk.end_ms].export(f"{directory}/chunk_{chunk.index + 1}.mp3", format="mp3")
+
+    env_values = dotenv_values(".env")  # load .env file
+    open_api_key = env_values["OPEN_AI_API_KEY"]  # access variables like a dictionary
+    logger.info("Loaded OPEN_AI_API_KEY from .env file: %s", bool(open_api_key))
+
+    client = OpenAI(api_key=open_api_key)
+
+    for chunk in chunks:
+        file_name = f"chunk_{chunk.index + 1}.mp3"
+        logger.info("Transcribing chunk: %s", file_name)
+        with open(os.path.join(directory, file_name), "rb") as audio_file:
+            transcription = client.audio.transcriptions.create(
+                model="gpt-4o-transcribe",
+                file=audio_file,
+                prompt=TRANSCRIPTION_PROMPT,
+            )
         text = transcription.text.strip()
-        
+
         with (open(f"../outputs/transcription/{file_name}_transcription.txt", "a", encoding="utf-8") as f):
-            f.write(f"\n--- CHUNK {i} ---\n")
+            f.write(f"\n--- CHUNK {chunk.index + 1} ---\n")
             f.write(text + "\n")
 
-        
-# # file can not be more than 25MB without splitting up
-# audio_file= open(file_path, "rb")
-
-# transcription = client.audio.transcriptions.create(
-#     model="gpt-4o-transcribe", 
-#     file=audio_file,
-#     prompt="This is a podcast episode discussing NFL football players for the purpose of Fantasy Football.",
-# )
-
-# with open("../outputs/transcription/openai_transcription.txt", "w", encoding="utf-8") as f:
-#     f.write(transcription.text.strip() + " ");
-
-# print(transcription.text)
-        
-
-
-
-# def trans/cribeThroughAPi(filename: str) -> dict:
-#     # Load your API key from an environment variable or secret management service
-#     import os
-#     from dotenv import load_dotenv
-#     import openai
-    
-#     env = load_dotenv()
-#     print(env.OPEN_AI_API_KEY)
-#     # openai.api_key = os.getenv("OPEN_AI_API_KEY")
-    
-#     # audio_file= open(filename, "rb")
-
 def getFasterTranscriptFromAudio(filename: str) -> dict:
-    from faster_whisper import WhisperModel, BatchedInferencePipeline
-    from tqdm import tqdm
     import datetime
-    
-    
-    
-    print("starting faster-whisper transcription at", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    model_size = "turbo"
-    compute_type = "int8"
-    model = WhisperModel(model_size, device="cpu", compute_type=compute_type)
-    batched_model = BatchedInferencePipeline(model=model)
-    
-    segments, info = batched_model.transcribe(
-        # "../resources/demo_transcription.mp3",
-        filename,
-        beam_size=5,
-        batch_size=8,
-        task="transcribe",
-        language="en",
-        initial_prompt="This is a podcast episode discussing NFL football players for the purpose of Fantasy Football.",
-        vad_filter=True,
-        word_timestamps=False
-    )
-    
-    print("set up segments at", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    
-    total_duration = info.duration
-    progress_bar = tqdm(total=total_duration, desc="Transcribing", unit="sec")
-    
+
+    logger.info("starting faster-whisper transcription at %s", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    transcription = transcribe_audio(filename)
+    logger.info("finished transcript at %s", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
     # outputs\transcription\demo_transcript.txt
     with open("../outputs/transcription/faster_whisper_transcription.txt", "w", encoding="utf-8") as f:
-        for segment in segments:
-            # segment = {id, seek, start, end, text, tokens, avg_logprob, compression_ratio, no_speech_prob, words, temperature}
-            # print("[%.2fs -> %.2fs] %s" % (segment.start, segment.end, segment.text))
-            
-            f.write(segment.text.strip() + " ")
-            # transcript += segment.text.strip() + " "
-            progress_bar.n = min(segment.end, total_duration)
-            progress_bar.refresh()
-    
-    progress_bar.close()
-    
-    print("finished transcript at", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    print("written to file")
-    
+        f.write(transcription.text + " ")
+    # the same transcript with segment timings, which analyzer.analyze accepts directly
+    transcription.save("../outputs/transcription/faster_whisper_transcription.timed.json")
+    logger.info("written to file")
+
     return {"message": "Transcription complete. See outputs folder for results."}
-    
+
 
 def getTranscriptFromAudio(filename: str) -> dict:
     import whisper
-    
+
     model = whisper.load_model("medium.en")
     result = model.transcribe(
         # "../resources/demo_transcription.mp3",
@@ -154,8 +201,8 @@ def getTranscriptFromAudio(filename: str) -> dict:
         language="en",
         fp16=False,
         beam_size=5,
-        initial_prompt="This is a podcast episode discussing NFL football players for the purpose of Fantasy Football.",
+        initial_prompt=TRANSCRIPTION_PROMPT,
         verbose=False
     )
-    
+
     return result
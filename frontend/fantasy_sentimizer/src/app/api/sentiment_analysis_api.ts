@@ -57,3 +57,52 @@ export async function getPlayerObjectForAnalysis(text: string): Promise<any> {
     return data;
 }
 
+
+// Streams /analyze/stream server-sent events; onEvent fires for every "progress", "player", "done" and "error" event
+// as it arrives, most-mentioned players first.
+export async function streamAnalysis(text: string, onEvent: (event: string, data: any) => void): Promise<void> {
+    const response = await fetch('http://localhost:5000/analyze/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            transcript: text
+        }),
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error(`API request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let separatorIndex = buffer.indexOf("\n\n");
+        while (separatorIndex !== -1) {
+            const rawEvent = buffer.slice(0, separatorIndex);
+            buffer = buffer.slice(separatorIndex + 2);
+
+            let event = "message";
+            let data = "";
+            for (const line of rawEvent.split("\n")) {
+                if (line.startsWith("event: ")) {
+                    event = line.slice("event: ".length);
+                } else if (line.startsWith("data: ")) {
+                    data += line.slice("data: ".length);
+                }
+            }
+            onEvent(event, data ? JSON.parse(data) : null);
+
+            separatorIndex = buffer.indexOf("\n\n");
+        }
+    }
+}
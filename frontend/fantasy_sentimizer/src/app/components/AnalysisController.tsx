@@ -11,7 +11,7 @@ import {
     CardTitle,
 } from "@/components/ui/card"
 
-import { getPlayerObjectForAnalysis, getNFLPlayers, performAnalysis } from "../api/sentiment_analysis_api";
+import { getPlayerObjectForAnalysis, getNFLPlayers, streamAnalysis } from "../api/sentiment_analysis_api";
 import { analyzeSentiment } from "../utils/sentiment_analysis";
 import { Spinner } from "@/components/ui/spinner";
 import { ImageWithFallback } from "./ImageWithBackup";
@@ -45,6 +45,7 @@ interface SentimentObject {
 
 export default function AnalysisController({ submittedText }: { submittedText: string }) {
     const [loading, setLoading] = useState<boolean>(false);
+    const [progress, setProgress] = useState<string>("");
     const [analysisResult, setAnalysisResult] = useState<SentimentObject>({});
     const [sortedPlayers, setSortedPlayers] = useState<string[]>([]);
 
@@ -3353,15 +3354,43 @@ export default function AnalysisController({ submittedText }: { submittedText: s
 
     async function callAPI() {
         setLoading(true);
+        setProgress("");
+        setAnalysisResult({});
+        setSortedPlayers([]);
         console.log("calling api")
         // const response = await getNFLPlayers();
         // const response = await getPlayerObjectForAnalysis(submittedText);
-        const response = await performAnalysis(submittedText);
-        console.log("response: ", response);
-        setAnalysisResult(response.data);
+        // players arrive most-mentioned first, so appending keeps the list sorted by mentions
+        try {
+            await streamAnalysis(submittedText, (event, data) => {
+                if (event === "player") {
+                    setAnalysisResult(previous => ({ ...previous, [data.player]: data.sentiment }));
+                    setSortedPlayers(previous => [...previous, data.player]);
+                } else if (event === "progress") {
+                    setProgress(progressText(data));
+                } else if (event === "error") {
+                    console.error("analysis failed: ", data.error);
+                }
+            });
+        } catch (error) {
+            console.error("analysis failed: ", error);
+        }
         setLoading(false);
     }
 
+    function progressText(data: any): string {
+        if (data.stage === "segmenting") {
+            return "reading transcript";
+        }
+        if (data.stage === "matching") {
+            return `${data.names_identified} names found`;
+        }
+        if (data.stage === "scoring") {
+            return `scoring ${data.players_total} players`;
+        }
+        return "";
+    }
+
     async function analyze() {
         console.log("in analyze")
 
@@ -8038,8 +8067,8 @@ export default function AnalysisController({ submittedText }: { submittedText: s
                 {/* {submittedText} */}
                 {
                     loading ?
-                        <Button disabled><Spinner /> Loading...</Button>
-                        : <Button onClick={mockCallAPI}>Click me</Button>
+                        <Button disabled><Spinner /> Loading... {progress}</Button>
+                        : <Button onClick={callAPI}>Click me</Button>
                 }
                 {
                     analysisResult && sortedPlayers.length > 0 &&